@@ -272,27 +272,109 @@
 #     else:
 #         st.write("⚠️ PhysioNet and VAE disagree. **Trust the VAE model** — it captures hidden patterns better than simple rules.")
 
+import json
+import hashlib
+import io
+import os
+import time
 import streamlit as st
-import torch
 import numpy as np
-import joblib
-import matplotlib.pyplot as plt
-from model.vae_model import VAE
-
-# Load saved model and scaler
-input_dim = 7
-latent_dim = 8
-model = VAE(input_dim, latent_dim)
-model.load_state_dict(torch.load("saved_models/vae_trained.pt"))
-model.eval()
-
-scaler = joblib.load("saved_models/scaler.joblib")
-threshold = joblib.load("saved_models/threshold.joblib")
+from utils.rules import RuleSet
+from utils.evaluation import EVALUATION_PATH
+from utils.latent_index import INDEX_PATH, load_index
+from utils.downsample import minmax_downsample
+from utils.instrumentation import REGISTRY, timer
+
+# torch, matplotlib, pandas and the model bundle are imported/loaded on first use, so the
+# page renders before any of them; Streamlit reruns reuse the already loaded modules.
+VITALS = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
+PHYSIO_RULES = RuleSet.builtin('physionet_score')
+
+
+def get_bundle():
+    # Cached per process, reloaded only if the bundle changes on disk
+    from model.bundle import load_bundle
+    bundle = load_bundle()
+    bundle.check_columns(VITALS)
+    return bundle
+
+
+# -----------------------------
+# Whole-stay trajectory mode
+# -----------------------------
+@st.cache_data(max_entries=32, show_spinner="Scoring every ICU hour...")
+def score_stay(digest, model_version, filename, _raw):
+    # Cached per file hash and model; _raw is excluded from Streamlit's own hashing
+    from utils.schema import read_table
+    from utils.scoring import prepare_patient, score_rows
+    bundle = get_bundle()
+    df = read_table(io.BytesIO(_raw), VITALS + ['ICULOS', 'SepsisLabel'], sep='|' if filename.endswith('.psv') else ',')
+    missing = [c for c in VITALS if c not in df]
+    if missing:
+        raise ValueError(f"missing vital columns {missing}")
+    X, hours, labels = prepare_patient(df)
+    return hours, labels, score_rows(bundle.model, bundle.scaler, bundle.threshold, X)
+
+
+def trajectory_view():
+    st.markdown("Upload one patient's PhysioNet `.psv` (or converted `.csv`) file to score every ICU hour.")
+    upload = st.file_uploader("Patient file", type=['psv', 'csv'])
+    if upload is None:
+        return
+    raw = upload.getvalue()
+    start = time.perf_counter()
+    bundle = get_bundle()
+    threshold = bundle.threshold
+    try:
+        hours, labels, scores = score_stay(hashlib.sha256(raw).hexdigest(), bundle.version, upload.name, raw)
+    except (KeyError, ValueError) as e:
+        st.error(f"❌ Could not score {upload.name}: {e}")
+        return
+    elapsed = time.perf_counter() - start
+    errors, vae_flag = scores['recon_error'], scores['vae_flag']
+    physio, physio_flag = scores['physio_score'], scores['physio_flag']
+    septic = labels == 1
+
+    def first(mask):
+        return f"hour {int(hours[np.argmax(mask)])}" if mask.any() else "never"
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("ICU hours", len(hours))
+    col2.metric("VAE alert hours", int(vae_flag.sum()))
+    col3.metric("PhysioNet alert hours", int(physio_flag.sum()))
+    st.write(f"First VAE alert: {first(vae_flag)} · first PhysioNet alert: {first(physio_flag)}"
+             + (f" · SepsisLabel from {first(septic)}" if (labels >= 0).all() else ""))
+
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(9, 5), sharex=True)
+    x, y = minmax_downsample(hours, errors)
+    ax1.plot(x, y, linewidth=1, label="VAE reconstruction error")
+    ax1.axhline(threshold, color="red", linestyle="--", linewidth=0.8, label=f"Threshold {threshold:.3f}")
+    x2, y2 = minmax_downsample(hours, physio)
+    ax2.step(x2, y2, where="post", color="tab:green", label="PhysioNet score")
+    ax2.axhline(PHYSIO_RULES.min_score, color="red", linestyle="--", linewidth=0.8, label="Alert score")
+    if septic.any():
+        for ax in (ax1, ax2):
+            ax.axvspan(hours[septic].min(), hours[septic].max(), color="orange", alpha=0.15, label="SepsisLabel = 1")
+    ax1.set_ylabel("Reconstruction error")
+    ax2.set_ylabel("PhysioNet score")
+    ax2.set_xlabel("ICU hour (ICULOS)")
+    ax1.legend(loc="upper left", fontsize=8)
+    ax2.legend(loc="upper left", fontsize=8)
+    st.pyplot(fig)
+    plt.close(fig)
+    st.caption(f"⏱️ {1000 * elapsed:.1f} ms to score (cached per file), "
+               f"{max(len(x), len(x2))} of {len(hours)} points plotted (min/max-preserving downsampling)")
 
 # --- Streamlit UI ---
 st.title("🧬 Sepsis Detection: PhysioNet vs VAE")
 st.markdown("Compare **traditional PhysioNet method** with **VAE-based approach**")
 
+mode = st.radio("Mode", ["Single reading", "Whole-stay trajectory"], horizontal=True)
+if mode == "Whole-stay trajectory":
+    trajectory_view()
+    st.stop()
+
 # User input form
 with st.form("vitals_form"):
     HR = st.number_input("Heart Rate (HR)", min_value=0.0, value=80.0)
@@ -305,27 +387,24 @@ with st.form("vitals_form"):
     submitted = st.form_submit_button("Analyze")
 
 if submitted:
+    import torch
+    bundle = get_bundle()
+    model, scaler, threshold = bundle.model, bundle.scaler, bundle.threshold
+
     # Prepare input
     input_data = np.array([[HR, O2Sat, Resp, Temp, MAP, WBC, Platelets]])
-    input_scaled = scaler.transform(input_data)
-    input_tensor = torch.tensor(input_scaled, dtype=torch.float32)
+    with timer('scaler_transform_seconds'):
+        input_scaled = scaler.transform(input_data)
+        input_tensor = torch.tensor(input_scaled, dtype=torch.float32)
 
     # --- PhysioNet method (heuristic baseline) ---
-    physio_score = (
-        (HR > 100) +
-        (O2Sat < 92) +
-        (Resp > 22) +
-        (Temp > 38 or Temp < 36) +
-        (MAP < 70) +
-        (WBC < 4 or WBC > 12) +
-        (Platelets < 150)
-    )
-    physio_detected = physio_score >= 2  # Simple rule
+    physio = PHYSIO_RULES.evaluate(input_data, VITALS)
+    physio_score = int(physio['score'][0])
+    physio_detected = bool(physio['detected'][0])
 
     # --- VAE method ---
-    with torch.no_grad():
-        recon, mu, logvar = model(input_tensor)
-        recon_error = torch.sum((input_tensor - recon) ** 2).item()
+    with timer('forward_seconds'):
+        recon_error = model.recon_error(input_tensor).item()
 
     vae_detected = recon_error > threshold
 
@@ -341,44 +420,78 @@ if submitted:
     else:
         st.success("✅ VAE: No Sepsis Detected (More Accurate)")
 
+    # --- Similar historical patient states (latent-space nearest neighbours) ---
+    if os.path.exists(INDEX_PATH):
+        index = load_index(INDEX_PATH)
+        if index.bundle_version != bundle.version:
+            st.caption(f"⚠️ Similar-patient index was built with model {index.bundle_version}; "
+                       f"rebuild it with `python build_latent_index.py`")
+        elif len(index):
+            with timer('neighbor_query_seconds'):
+                similar = index.neighbors(model.embed(input_tensor).numpy(), k=10)
+            st.subheader("🔎 Most Similar Historical Patient States")
+            septic = sum(n['septic'] == 1 for n in similar)
+            st.write(f"{septic} of {len(similar)} nearest states belong to patients who developed sepsis")
+            st.table({
+                "Patient": [n['patient'] for n in similar],
+                "ICU hour": [n['hour'] for n in similar],
+                "Distance": [round(n['distance'], 3) for n in similar],
+                "SepsisLabel": [n['label'] for n in similar],
+                "Developed sepsis": ["yes" if n['septic'] == 1 else "no" for n in similar],
+            })
+
+    # Scoring latency, averaged over every request served by this process
+    timings = REGISTRY.summary()
+    st.caption("⏱️ " + ", ".join(
+        f"{name.replace('_seconds', '')} {1000 * total / max(n, 1):.2f} ms avg over {n}"
+        for name, (n, total) in timings.items()))
+
     # --- Metrics Comparison ---
     st.subheader("📊 Model Comparison Metrics")
 
-    metrics = {
-        "Accuracy": [0.88, 0.92],
-        "Precision": [0.85, 0.91],
-        "Recall": [0.87, 0.93],
-        "F1-Score": [0.86, 0.92]
-    }
-
-    st.write("**PhysioNet vs VAE Metrics**")
-    st.table({
-        "Metric": list(metrics.keys()),
-        "PhysioNet": [v[0] for v in metrics.values()],
-        "VAE": [v[1] for v in metrics.values()]
-    })
-
-    # --- Line Graph Comparison ---
-    st.subheader("📈 Visual Comparison: PhysioNet vs VAE")
-
-    x = np.arange(1, 11)
-
-    # Base smooth curve
-    base_curve = np.linspace(0.2, 0.8, 10)
-
-    # Add slight variations
-    physio_curve = base_curve + np.random.normal(0, 0.03, 10)
-    vae_curve = base_curve + np.random.normal(0, 0.01, 10)
-
-    plt.figure(figsize=(8, 4))
-    plt.plot(x, physio_curve, label="PhysioNet", marker="o", linestyle="--")
-    plt.plot(x, vae_curve, label="VAE (Accurate)", marker="s", linestyle="-")
-    plt.xlabel("Patient Cases")
-    plt.ylabel("Prediction Confidence (0=No Sepsis, 1=Sepsis)")
-    plt.title("PhysioNet vs VAE Prediction Comparison")
-    plt.ylim(0, 1)
-    plt.legend()
-    st.pyplot(plt)
-
-
-
+    # Real numbers from: python evaluate.py --input <held-out PSV folder>
+    if os.path.exists(EVALUATION_PATH):
+        with open(EVALUATION_PATH) as f:
+            report = json.load(f)
+        # evaluate.py --rules can leave the PhysioNet rule set out; the VAE is always there
+        physio_m = report['methods'].get('physionet_score')
+        vae_m = report['methods']['vae']
+        metrics = {
+            "AUROC": 'auroc', "AUPRC": 'auprc', "Accuracy": 'accuracy', "Precision": 'precision',
+            "Recall": 'recall', "F1-Score": 'f1', "Utility (PhysioNet 2019)": 'utility',
+        }
+
+        st.write(f"**PhysioNet vs VAE Metrics** ({report['patients']} patients, {report['rows']} hourly rows)")
+        if report['model_version'] != bundle.version:
+            st.caption(f"⚠️ Evaluated with model {report['model_version']}, current model is {bundle.version}")
+        table = {"Metric": list(metrics.keys())}
+        if physio_m is not None:
+            table["PhysioNet"] = [round(physio_m[key], 3) for key in metrics.values()]
+        table["VAE"] = [round(vae_m[key], 3) for key in metrics.values()]
+        st.table(table)
+        if physio_m is None:
+            st.info("The evaluation report has no PhysioNet rules: re-run `python evaluate.py` with "
+                    "`--rules physionet_score ...` to compare against them.")
+
+        # --- ROC Comparison ---
+        st.subheader("📈 Visual Comparison: PhysioNet vs VAE")
+
+        import matplotlib.pyplot as plt
+        plt.figure(figsize=(8, 4))
+        physio_roc = report['roc'].get('physionet_score')
+        if physio_m is not None and physio_roc is not None:
+            plt.plot(physio_roc['fpr'], physio_roc['tpr'],
+                     label=f"PhysioNet (AUROC {physio_m['auroc']:.3f})", marker="o", linestyle="--")
+        plt.plot(report['roc']['vae']['fpr'], report['roc']['vae']['tpr'],
+                 label=f"VAE (AUROC {vae_m['auroc']:.3f})", marker="s", linestyle="-")
+        plt.plot([0, 1], [0, 1], color="grey", linewidth=0.5)
+        plt.xlabel("False Positive Rate")
+        plt.ylabel("True Positive Rate")
+        plt.title("ROC on hourly SepsisLabel")
+        plt.xlim(0, 1)
+        plt.ylim(0, 1)
+        plt.legend()
+        st.pyplot(plt)
+    else:
+        st.info(f"No evaluation results yet: run `python evaluate.py --input <held-out PSV folder>` "
+                f"to compare both methods against SepsisLabel (writes {EVALUATION_PATH}).")
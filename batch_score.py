@@ -0,0 +1,90 @@
+import argparse
+import os
+import time
+import numpy as np
+import torch
+from model.precision import PRECISIONS
+from utils.scoring import load_artifacts, score_rows, iter_chunks
+from utils.instrumentation import add_arguments, instrumented, timer
+
+# -----------------------------
+# Batch scoring for whole cohorts
+# -----------------------------
+# python batch_score.py --input data/converted_csvs --output outputs/scores.npz
+# A .parquet output path streams each chunk through pyarrow instead.
+
+
+class ResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self.writer = None
+        self.parts = []
+
+    def write(self, columns):
+        if not self.parquet:
+            self.parts.append(columns)
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table(columns)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.parquet:
+            if self.writer is not None:
+                self.writer.close()
+            return
+        merged = {k: np.concatenate([p[k] for p in self.parts]) for k in self.parts[0]} if self.parts else {}
+        np.savez(self.path, **merged)
+
+
+def run(args):
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+    model, scaler, threshold = load_artifacts(args.model_dir, args.precision)
+    writer = ResultWriter(args.output)
+
+    total_rows = 0
+    score_time = 0.0
+    start = time.perf_counter()
+    for ids, hours, labels, X in iter_chunks(args.input, args.chunk_rows):
+        t0 = time.perf_counter()
+        scores = score_rows(model, scaler, threshold, X, args.batch_size, args.mc_samples)
+        score_time += time.perf_counter() - t0
+
+        with timer('write_seconds'):
+            writer.write({'patient': ids, 'ICULOS': hours, 'SepsisLabel': labels, **scores})
+        total_rows += len(X)
+        print(f"Scored {total_rows} rows")
+    writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {total_rows} rows written to {args.output}")
+    print(f"Throughput: {total_rows / max(elapsed, 1e-9):,.0f} rows/sec end-to-end, "
+          f"{total_rows / max(score_time, 1e-9):,.0f} rows/sec scoring only")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every hourly row of a cohort")
+    parser.add_argument('--input', default='data/converted_csvs', help="folder of .csv or .psv patient files")
+    parser.add_argument('--output', default='outputs/scores.npz', help=".npz or .parquet")
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--precision', choices=PRECISIONS, default='fp32', help="inference precision (see model/precision.py)")
+    parser.add_argument('--chunk-rows', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--mc-samples', type=int, default=0,
+                        help="latent draws per row for Monte Carlo error/variance (0 = deterministic)")
+    parser.add_argument('--threads', type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    with instrumented(args, 'batch_score'):
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+# -----------------------------
+# Data-parallel training: speedup vs number of processes
+# -----------------------------
+# python bench_distributed.py                           synthetic cohort, 1/2/4 processes
+# python bench_distributed.py --input data/patient_store --nproc 1 2 4 8 --epochs 5
+# Every run trains the same VAE for a fixed number of epochs (no early stopping) with the
+# same per-rank batch size, so throughput is comparable across process counts.
+
+REPORT_PATH = 'outputs/distributed_scaling.json'
+columns = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
+
+
+def write_synthetic_store(path, n_patients, seed=0):
+    from utils.synthetic import generate_cohort
+    from utils.store import write_store
+    df, offsets = generate_cohort(n_patients, seed)
+    values = df[columns].to_numpy(dtype=np.float32)
+    labels = df['SepsisLabel'].to_numpy(dtype=np.int8)
+    write_store(path, [f"p{i + 1:06d}" for i in range(n_patients)], columns,
+                [values[a:b] for a, b in zip(offsets[:-1], offsets[1:])],
+                [labels[a:b] for a, b in zip(offsets[:-1], offsets[1:])])
+
+
+def _worker(rank, world_size, port, queue, source, patients, args):
+    import torch
+    from model.training import init_process_group, load_shard, train_data_parallel
+    from model.vae_model import VAE
+    from utils.preprocessing import train_val_split
+    init_process_group(rank, world_size, port, args.threads)
+    try:
+        X_scaled, _ = load_shard(source, columns, patients, rank, world_size)
+        train_data, val_data = train_val_split(X_scaled)
+        model = VAE(X_scaled.shape[1], args.latent_dim)
+        history = train_data_parallel(model, train_data, val_data, epochs=args.epochs,
+                                      batch_size=args.batch_size, patience=0, log=lambda msg: None)
+        if rank == 0:
+            queue.put(history)
+        torch.distributed.barrier()
+    finally:
+        torch.distributed.destroy_process_group()
+
+
+def run(source, args):
+    from model.training import spawn_data_parallel
+    from utils.preprocessing import list_patients
+    patients = list_patients(source)
+    results = {}
+    for nproc in args.nproc:
+        start = time.perf_counter()
+        history = spawn_data_parallel(_worker, nproc, source, patients, args)
+        wall = time.perf_counter() - start
+        # The first epoch includes DDP setup and warm-up; report the steady state
+        steady = history[1:] or history
+        results[nproc] = {
+            'samples_per_sec': float(np.mean([h['samples_per_sec'] for h in steady])),
+            'wall_seconds': wall,
+            'final_val_loss': history[-1]['val_loss'],
+        }
+        print(f"  {nproc} processes: {results[nproc]['samples_per_sec']:,.0f} samples/sec, "
+              f"val loss {results[nproc]['final_val_loss']:.4f}, {wall:.1f}s wall")
+    return len(patients), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling of data-parallel (torch.distributed, gloo) VAE training")
+    parser.add_argument('--input', default=None, help="patient store or folder of CSVs (default: synthetic cohort)")
+    parser.add_argument('--patients', type=int, default=5000, help="synthetic cohort size")
+    parser.add_argument('--nproc', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=256, help="rows per rank per step")
+    parser.add_argument('--latent-dim', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=0, help="torch threads per process (0 = cores / processes)")
+    parser.add_argument('--output', default=REPORT_PATH)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    if args.input:
+        n_patients, results = run(args.input, args)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_synthetic_store(tmp, args.patients)
+            n_patients, results = run(tmp, args)
+
+    base = results[min(results)]
+    print(f"\n{'processes':>9s} {'samples/sec':>12s} {'speedup':>8s} {'efficiency':>10s} {'val loss':>9s}")
+    for nproc, r in results.items():
+        r['speedup'] = r['samples_per_sec'] / base['samples_per_sec']
+        r['efficiency'] = r['speedup'] * min(results) / nproc
+        print(f"{nproc:9d} {r['samples_per_sec']:12,.0f} {r['speedup']:7.2f}x {r['efficiency']:10.0%} "
+              f"{r['final_val_loss']:9.4f}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({'cpus': os.cpu_count(), 'patients': n_patients, 'epochs': args.epochs,
+                   'batch_size': args.batch_size, 'runs': {str(n): r for n, r in results.items()}}, f, indent=1)
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from utils.benchmarking import throughput
+
+# -----------------------------
+# NumPy vs torch inference: parity check + benchmark
+# -----------------------------
+# python bench_numpy_vae.py              export the weight pack if needed, check parity, benchmark
+# python bench_numpy_vae.py --check-only exits non-zero if the engines disagree
+
+# Child process for cold-start measurements: import, load, score one row
+COLD_START = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import numpy as np
+engine, path = sys.argv[1], sys.argv[2]
+if engine == 'numpy':
+    from model.numpy_vae import NumpyVAE
+    t1 = time.perf_counter()
+    m = NumpyVAE.load(path)
+    t2 = time.perf_counter()
+    m.recon_error(m.transform([[80, 98, 16, 36.8, 90, 7, 250]]))
+else:
+    import torch
+    from model.bundle import load_bundle
+    t1 = time.perf_counter()
+    b = load_bundle(path)
+    t2 = time.perf_counter()
+    b.model.recon_error(torch.tensor(b.scaler.transform([[80, 98, 16, 36.8, 90, 7, 250]]), dtype=torch.float32))
+t3 = time.perf_counter()
+# VmHWM resets on exec; ru_maxrss would also count the forked parent's pages
+try:
+    with open('/proc/self/status') as f:
+        rss = next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024
+except OSError:
+    rss = float('nan')
+print(json.dumps({'import_s': t1 - t0, 'load_s': t2 - t1, 'first_score_s': t3 - t2, 'peak_rss_mb': rss}))
+'''
+
+
+def parity(bundle, engine, n=100000, seed=0):
+    import torch
+    rng = np.random.default_rng(seed)
+    # Inside and slightly outside the scaler's 0-1 range
+    X = rng.uniform(-0.2, 1.2, size=(n, bundle.input_dim)).astype(np.float32)
+    ref_recon = bundle.model.reconstruct(torch.from_numpy(X)).numpy()
+    ref_error = bundle.model.recon_error(torch.from_numpy(X)).numpy()
+    recon = engine.reconstruct(X)
+    error = engine.recon_error(X)
+
+    recon_diff = float(np.abs(recon - ref_recon).max())
+    error_diff = float(np.abs(error - ref_error).max())
+    flag_mismatch = int(((error > engine.threshold) != (ref_error > bundle.threshold)).sum())
+    return recon_diff, error_diff, flag_mismatch
+
+
+def cold_start(engine, path, repeats):
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', COLD_START, engine, path],
+                             capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        result['process_s'] = time.perf_counter() - start
+        runs.append(result)
+    return {k: float(np.median([r[k] for r in runs])) for k in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity check and benchmark for the NumPy VAE engine")
+    parser.add_argument('--bundle', default='saved_models/vae_bundle.pt')
+    parser.add_argument('--weights', default='saved_models/vae_numpy.npz')
+    parser.add_argument('--tolerance', type=float, default=1e-5)
+    parser.add_argument('--repeats', type=int, default=3, help="cold-start runs per engine")
+    parser.add_argument('--check-only', action='store_true')
+    args = parser.parse_args()
+
+    import torch
+    from model.bundle import load_bundle
+    from model.numpy_vae import NumpyVAE, export_weights
+
+    bundle = load_bundle(args.bundle)
+    if not os.path.exists(args.weights):
+        export_weights(bundle, args.weights)
+        print(f"Exported NumPy weight pack to {args.weights}")
+    engine = NumpyVAE.load(args.weights)
+    if engine.version != bundle.version:
+        export_weights(bundle, args.weights)
+        engine = NumpyVAE.load(args.weights)
+        print(f"Re-exported stale NumPy weight pack to {args.weights}")
+
+    recon_diff, error_diff, flag_mismatch = parity(bundle, engine)
+    ok = recon_diff <= args.tolerance and error_diff <= args.tolerance * bundle.input_dim and flag_mismatch == 0
+    print(f"Parity: max |recon diff| {recon_diff:.2e}, max |error diff| {error_diff:.2e}, "
+          f"flag mismatches {flag_mismatch} -> {'OK' if ok else 'FAILED'}")
+    if args.check_only or not ok:
+        sys.exit(0 if ok else 1)
+
+    print("\nCold start (median of subprocess runs):")
+    for name, path in [('torch', args.bundle), ('numpy', args.weights)]:
+        r = cold_start(name, path, args.repeats)
+        print(f"  {name:5s}  process {r['process_s']*1000:7.1f} ms | import {r['import_s']*1000:7.1f} ms | "
+              f"load {r['load_s']*1000:6.1f} ms | first score {r['first_score_s']*1000:6.2f} ms | "
+              f"peak RSS {r['peak_rss_mb']:6.1f} MB")
+
+    print("\nBatch throughput (rows/sec):")
+    X = np.random.default_rng(1).uniform(0, 1, size=(65536, bundle.input_dim)).astype(np.float32)
+    torch_fn = lambda x: bundle.model.recon_error(torch.from_numpy(x)).numpy()
+    for batch_size in [1, 64, 4096, 65536]:
+        data = X[:max(batch_size, 4096)] if batch_size < 4096 else X
+        t = throughput(torch_fn, data, batch_size)
+        n = throughput(engine.recon_error, data, batch_size)
+        print(f"  batch {batch_size:6d}: torch {t:12,.0f} | numpy {n:12,.0f} | x{n / t:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
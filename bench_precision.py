@@ -0,0 +1,134 @@
+import argparse
+import io
+import json
+import os
+import sys
+import numpy as np
+from utils.benchmarking import throughput
+
+# -----------------------------
+# Reduced-precision inference: throughput and drift vs fp32
+# -----------------------------
+# python bench_precision.py                         synthetic cohort, all precisions
+# python bench_precision.py --input data/raw_psv --max-flip-rate 0.001
+# Drift is measured on reconstruction errors and on flag decisions against the stored
+# threshold (saved_models/threshold.joblib, or the bundle's threshold if it is missing).
+
+REPORT_PATH = 'outputs/precision_report.json'
+
+
+def load_rows(input_folder, n_rows, seed=0):
+    # Filled, unscaled vitals from real patient files, or from a synthetic cohort
+    from utils.scoring import columns, iter_chunks
+    if input_folder:
+        blocks, n = [], 0
+        for _, _, _, X in iter_chunks(input_folder):
+            blocks.append(X)
+            n += len(X)
+            if n >= n_rows:
+                break
+        X = np.vstack(blocks)[:n_rows]
+    else:
+        from utils.synthetic import generate_cohort
+        from utils.preprocessing import segment_bfill, segment_ffill
+        df, offsets = generate_cohort(max(1, n_rows // 38), seed)
+        X = df[columns].to_numpy(dtype=np.float64)
+        X = segment_bfill(segment_ffill(X, offsets), offsets)
+    return X[~np.isnan(X).any(axis=1)]
+
+
+def model_bytes(model):
+    import torch
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell()
+
+
+def drift(errors, reference, threshold):
+    flags, ref_flags = errors > threshold, reference > threshold
+    flips = flags != ref_flags
+    rel = np.abs(errors - reference) / np.maximum(np.abs(reference), 1e-12)
+    return {
+        'max_abs_error_diff': float(np.abs(errors - reference).max()),
+        'mean_rel_error_diff': float(rel.mean()),
+        'p99_rel_error_diff': float(np.percentile(rel, 99)),
+        'flag_flips': int(flips.sum()),
+        'flag_flip_rate': float(flips.mean()),
+        'new_flags': int((flags & ~ref_flags).sum()),
+        'lost_flags': int((~flags & ref_flags).sum()),
+    }
+
+
+def main():
+    from model.precision import PRECISIONS
+    parser = argparse.ArgumentParser(description="Throughput and accuracy drift of reduced-precision VAE inference")
+    parser.add_argument('--bundle', default='saved_models/vae_bundle.pt')
+    parser.add_argument('--threshold', default='saved_models/threshold.joblib')
+    parser.add_argument('--input', default=None, help="folder of .psv/.csv patient files (default: synthetic cohort)")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--precisions', nargs='+', choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[64, 4096, 65536])
+    parser.add_argument('--threads', type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument('--max-flip-rate', type=float, default=None,
+                        help="exit non-zero if any precision flips more than this fraction of flags")
+    parser.add_argument('--output', default=REPORT_PATH)
+    args = parser.parse_args()
+
+    import torch
+    from model.bundle import load_bundle
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    reference = load_bundle(args.bundle, 'fp32')
+    if os.path.exists(args.threshold):
+        import joblib
+        threshold = float(joblib.load(args.threshold))
+    else:
+        threshold = reference.threshold
+    X = torch.from_numpy(reference.scaler.transform(load_rows(args.input, args.rows)).astype(np.float32))
+    print(f"{len(X)} rows, threshold {threshold:.4f}, model {reference.version}")
+
+    def errors_of(model):
+        return np.concatenate([model.recon_error(X[i:i + 65536]).numpy() for i in range(0, len(X), 65536)])
+
+    ref_errors = errors_of(reference.model)
+    ref_flags = int((ref_errors > threshold).sum())
+    report = {'model_version': reference.version, 'rows': len(X), 'threshold': threshold,
+              'fp32_flags': ref_flags, 'precisions': {}}
+    for precision in args.precisions:
+        bundle = load_bundle(args.bundle, precision)
+        fn = lambda x: bundle.model.recon_error(x)
+        result = {
+            'model_bytes': model_bytes(bundle.model),
+            'rows_per_sec': {str(b): throughput(fn, X[:max(b, 4096)] if b < 4096 else X, b)
+                             for b in args.batch_sizes},
+            **drift(errors_of(bundle.model), ref_errors, threshold),
+        }
+        report['precisions'][precision] = result
+
+    base = report['precisions'].get('fp32')
+    print(f"\n{'precision':9s} {'size KB':>8s} " + " ".join(f"{'b=' + str(b):>14s}" for b in args.batch_sizes)
+          + f" {'max |Δerr|':>11s} {'mean rel':>9s} {'flips':>7s} {'flip rate':>10s}")
+    for precision, r in report['precisions'].items():
+        speed = " ".join(
+            f"{r['rows_per_sec'][str(b)]:>8,.0f}" + (f" x{r['rows_per_sec'][str(b)] / base['rows_per_sec'][str(b)]:4.2f}"
+                                                    if base else "      ")
+            for b in args.batch_sizes)
+        print(f"{precision:9s} {r['model_bytes'] / 1024:8.1f} {speed} {r['max_abs_error_diff']:11.2e} "
+              f"{r['mean_rel_error_diff']:9.2e} {r['flag_flips']:7d} {r['flag_flip_rate']:10.2e}")
+    print(f"(fp32 flags {ref_flags} of {len(X)} rows)")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved to {args.output}")
+
+    if args.max_flip_rate is not None:
+        worst = max(r['flag_flip_rate'] for r in report['precisions'].values())
+        if worst > args.max_flip_rate:
+            print(f"❌ Flag flip rate {worst:.2e} exceeds {args.max_flip_rate:.2e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+# -----------------------------
+# Cold-start benchmark for the entry points
+# -----------------------------
+# python bench_startup.py                 import times, serve and app cold starts
+# python bench_startup.py --repeat 5      median over 5 fresh processes each
+# Every measurement runs in a fresh interpreter, as on a freshly scaled-out container:
+#   import      python -X importtime -c "import <entry point>" (total and heaviest packages)
+#   serve       process start -> first successful POST /score
+#   app         process start -> first complete render, then -> first scored form submit
+#               (streamlit.testing AppTest; skipped when streamlit is not installed)
+
+REPORT_PATH = 'outputs/startup_report.json'
+ENTRY_POINTS = ['serve', 'batch_score', 'evaluate', 'calibrate_threshold', 'replay_stream',
+                'train_vae', 'convert_psv_to_csv', 'build_latent_index']
+ROW = {'HR': 80, 'O2Sat': 98, 'Resp': 16, 'Temp': 36.8, 'MAP': 90, 'WBC': 7, 'Platelets': 250}
+
+# Child process for the app: time to first render, then to the first scored submit
+APP_START = r'''
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=120)
+at.run()
+t1 = time.perf_counter()
+at.button[0].click().run()
+t2 = time.perf_counter()
+print(json.dumps({'first_render_seconds': t1 - t0, 'first_score_seconds': t2 - t0,
+                  'errors': [str(e.value) for e in at.exception]}))
+'''
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def import_time(module):
+    # (total seconds, [(package, seconds)] heaviest imports made directly by the module).
+    # importtime prints a module after everything it imports, children indented by depth.
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         capture_output=True, text=True, check=True)
+    subtree = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 0 and name.strip() == module:
+            children = [(n, s) for d, n, s in subtree if d == 1]
+            return seconds, sorted(children, key=lambda t: -t[1])[:3]
+        subtree = [] if depth == 0 else subtree + [(depth, name.strip(), seconds)]
+    raise RuntimeError(f"{module} was not imported")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve_first_score(model_dir, timeout=120):
+    # Seconds from process start until the first POST /score succeeds
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'serve.py', '--port', str(port), '--model-dir', model_dir],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    body = json.dumps(ROW).encode()
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                request = urllib.request.Request(f'http://127.0.0.1:{port}/score', data=body,
+                                                 headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"serve.py exited with {proc.returncode}")
+                time.sleep(0.01)
+        raise RuntimeError(f"serve.py did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def app_first_render():
+    try:
+        import streamlit  # noqa: F401 (only checks that the app can be driven)
+    except ImportError:
+        return None
+    out = subprocess.run([sys.executable, '-c', APP_START], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time, time to first render and time to first score")
+    parser.add_argument('--repeat', type=int, default=3, help="fresh processes per measurement (median reported)")
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--entry-points', nargs='+', default=ENTRY_POINTS)
+    parser.add_argument('--output', default=REPORT_PATH)
+    args = parser.parse_args()
+    report = {'python': sys.version.split()[0], 'repeat': args.repeat, 'imports': {}}
+
+    print(f"{'entry point':22s} {'import s':>9s}  heaviest imports")
+    for module in args.entry_points:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        total = median([r[0] for r in runs])
+        heaviest = runs[-1][1]
+        report['imports'][module] = {'seconds': total, 'heaviest': dict(heaviest)}
+        print(f"{module:22s} {total:9.3f}  " + ", ".join(f"{name} {s:.3f}" for name, s in heaviest))
+
+    report['serve_first_score_seconds'] = median([serve_first_score(args.model_dir) for _ in range(args.repeat)])
+    print(f"\nserve.py: first /score answered {report['serve_first_score_seconds']:.3f}s after process start")
+
+    app_runs = [app_first_render() for _ in range(args.repeat)]
+    if app_runs[0] is None:
+        report['app'] = None
+        print("app.py: skipped (streamlit is not installed)")
+    else:
+        report['app'] = {key: median([r[key] for r in app_runs]) for key in ('first_render_seconds', 'first_score_seconds')}
+        report['app']['errors'] = app_runs[-1]['errors']
+        print(f"app.py: first render {report['app']['first_render_seconds']:.3f}s, "
+              f"first score {report['app']['first_score_seconds']:.3f}s after process start")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
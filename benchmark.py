@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# -----------------------------
+# End-to-end pipeline benchmark at synthetic scale
+# -----------------------------
+# python benchmark.py --patients 1000 40000 --stages convert store preprocess_csv preprocess_stream train score
+# Each stage runs in a fresh interpreter so wall time and peak RSS are its own.
+# Results are appended to a JSON-lines history and compared with the previous
+# run of the same stage and scale, so regressions show up between commits.
+
+VITALS = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
+STAGES = ['convert', 'store', 'preprocess_csv', 'preprocess_stream', 'train', 'score']
+
+RUNNER = r'''
+import json, sys, time
+sys.path.insert(0, sys.argv[3])
+import benchmark
+start = time.perf_counter()
+rows = benchmark.run_stage(sys.argv[1], sys.argv[2])
+wall = time.perf_counter() - start
+try:
+    with open('/proc/self/status') as f:
+        rss = next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({'rows': rows, 'wall_s': wall, 'peak_rss_mb': rss}))
+'''
+
+
+def paths(workdir):
+    return {k: os.path.join(workdir, k) for k in ('raw_psv', 'converted_csvs', 'patient_store')}
+
+
+def run_stage(stage, workdir):
+    # Runs inside the child interpreter; returns the number of rows processed
+    p = paths(workdir)
+    if stage == 'convert':
+        import convert_psv_to_csv
+        sys.argv = ['convert_psv_to_csv.py', '--input', p['raw_psv'], '--output', p['converted_csvs'], '--force']
+        convert_psv_to_csv.main()
+        with open(os.path.join(workdir, 'meta.json')) as f:
+            return json.load(f)['rows']
+    if stage == 'store':
+        from utils.store import build_store
+        return build_store(p['raw_psv'], p['patient_store'])
+    if stage == 'preprocess_csv':
+        from utils.preprocessing import preprocess_all_csvs
+        X, _ = preprocess_all_csvs(p['converted_csvs'], VITALS)
+        return len(X)
+    if stage == 'preprocess_stream':
+        from utils.preprocessing import fit_scaler, iter_scaled_chunks
+        scaler, _ = fit_scaler(p['patient_store'], VITALS)
+        return sum(len(c) for c in iter_scaled_chunks(p['patient_store'], VITALS, scaler))
+    if stage == 'train':
+        import numpy as np
+        import torch
+        from model.vae_model import VAE
+        from model.training import train
+        from utils.preprocessing import fit_scaler, iter_scaled_chunks
+        scaler, _ = fit_scaler(p['patient_store'], VITALS)
+        X = torch.from_numpy(np.vstack(list(iter_scaled_chunks(p['patient_store'], VITALS, scaler))))
+        split = int(len(X) * 0.8)
+        train(VAE(len(VITALS), 8), X[:split], X[split:], epochs=1, batch_size=256, patience=0, log=lambda *_: None)
+        return split
+    if stage == 'score':
+        from utils.scoring import load_artifacts, iter_chunks, score_rows
+        model, scaler, threshold = load_artifacts()
+        rows = 0
+        for _, _, _, X in iter_chunks(p['raw_psv']):
+            score_rows(model, scaler, threshold, X)
+            rows += len(X)
+        return rows
+    raise ValueError(f"unknown stage {stage}")
+
+
+def ensure_data(workdir, n_patients, seed):
+    meta_path = os.path.join(workdir, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['patients'] == n_patients and meta['seed'] == seed:
+            return meta
+    from utils.synthetic import write_psv_cohort
+    start = time.perf_counter()
+    rows = write_psv_cohort(paths(workdir)['raw_psv'], n_patients, seed)
+    meta = {'patients': n_patients, 'seed': seed, 'rows': rows}
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    print(f"Generated {n_patients} synthetic patients ({rows} rows) in {time.perf_counter() - start:.1f}s")
+    return meta
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic PhysioNet-scale data")
+    parser.add_argument('--patients', type=int, nargs='+', default=[1000])
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--workdir', default='outputs/bench')
+    parser.add_argument('--history', default='outputs/bench_history.jsonl')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    history = load_history(args.history)
+    os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+    commit = git_commit()
+
+    for n_patients in args.patients:
+        workdir = os.path.join(args.workdir, str(n_patients))
+        meta = ensure_data(workdir, n_patients, args.seed)
+        print(f"\n=== {n_patients} patients, {meta['rows']} rows ===")
+        for stage in args.stages:
+            out = subprocess.run([sys.executable, '-c', RUNNER, stage, workdir, repo],
+                                 capture_output=True, text=True, cwd=repo)
+            if out.returncode != 0:
+                print(f"  {stage:18s} FAILED\n{out.stderr[-2000:]}")
+                continue
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'stage': stage,
+                      'patients': n_patients, 'rows': result['rows'], 'wall_s': result['wall_s'],
+                      'peak_rss_mb': result['peak_rss_mb'],
+                      'rows_per_sec': result['rows'] / max(result['wall_s'], 1e-9)}
+
+            previous = [h for h in history if h['stage'] == stage and h['patients'] == n_patients]
+            change = ''
+            if previous:
+                before = previous[-1]['wall_s']
+                change = f" ({(record['wall_s'] - before) / before * 100:+.0f}% vs {previous[-1]['commit']})"
+            print(f"  {stage:18s} {record['wall_s']:8.2f}s  {record['rows_per_sec']:12,.0f} rows/sec  "
+                  f"peak RSS {record['peak_rss_mb']:7.1f} MB{change}")
+
+            history.append(record)
+            with open(args.history, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import os
+import time
+import numpy as np
+from model.bundle import load_bundle
+from utils.latent_index import INDEX_PATH, LatentIndex, septic_patients
+from utils.scoring import columns, embed_rows, iter_chunks
+from utils.instrumentation import add_arguments, instrumented
+
+# -----------------------------
+# Latent-space index for similar-patient retrieval
+# -----------------------------
+# python build_latent_index.py --input data/converted_csvs          (full rebuild)
+# python build_latent_index.py --input data/converted_csvs --add    (only patients not indexed yet)
+# Every hourly row with all vitals present is embedded as the encoder's mu and stored with
+# its patient, ICU hour, SepsisLabel and the patient's eventual sepsis outcome.
+
+
+def embed_patients(model, scaler, folder_path, patients=None, chunk_rows=200000):
+    # Yields (Z, patient_ids, hours, labels, septic) for the rows that could be embedded
+    for ids, hours, labels, X in iter_chunks(folder_path, chunk_rows, patients):
+        Z = embed_rows(model, scaler, X)
+        keep = ~np.isnan(Z).any(axis=1)
+        yield Z[keep], ids[keep], hours[keep], labels[keep], septic_patients(ids, labels)[keep]
+
+
+def query_latency(index, n_queries=200, k=10, seed=0):
+    # Mean milliseconds per single-row query, using indexed points as queries
+    rng = np.random.default_rng(seed)
+    queries = index.embeddings[rng.integers(0, len(index), n_queries)]
+    start = time.perf_counter()
+    for z in queries:
+        index.query(z, k)
+    return 1000 * (time.perf_counter() - start) / n_queries
+
+
+def run(args):
+    bundle = load_bundle(os.path.join(args.model_dir, "vae_bundle.pt"))
+    bundle.check_columns(columns)
+    start = time.perf_counter()
+
+    if args.add and os.path.exists(args.output):
+        index = LatentIndex.load(args.output, bundle.version)
+        known = index.patient_set()
+        files = sorted(os.path.splitext(f)[0] for f in os.listdir(args.input) if f.endswith(('.csv', '.psv')))
+        new = [p for p in files if p not in known]
+        print(f"{len(known)} patients already indexed, {len(new)} new")
+        for block in embed_patients(bundle.model, bundle.scaler, args.input, new, args.chunk_rows):
+            index.add(*block)
+    else:
+        blocks = list(embed_patients(bundle.model, bundle.scaler, args.input, chunk_rows=args.chunk_rows))
+        if sum(len(block[0]) for block in blocks) == 0:
+            raise SystemExit(f"No patient rows with all vitals present in {args.input}")
+        index = LatentIndex(*[np.concatenate(field) for field in zip(*blocks)], bundle_version=bundle.version)
+    index.save(args.output)
+
+    print(f"✅ {len(index)} rows from {len(index.patient_set())} patients indexed in "
+          f"{time.perf_counter() - start:.1f}s -> {args.output} (model {bundle.version})")
+    if len(index):
+        print(f"Query latency: {query_latency(index, k=args.k):.3f} ms for k={args.k}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the latent (mu) nearest-neighbour index of patient states")
+    parser.add_argument('--input', default='data/converted_csvs', help="folder of .psv or .csv patient files")
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--output', default=INDEX_PATH)
+    parser.add_argument('--add', action='store_true', help="insert patients missing from the existing index")
+    parser.add_argument('--chunk-rows', type=int, default=200000)
+    parser.add_argument('--k', type=int, default=10, help="neighbours for the latency check")
+    add_arguments(parser)
+    args = parser.parse_args()
+    with instrumented(args, 'build_latent_index'):
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
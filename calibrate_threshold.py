@@ -0,0 +1,83 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils.calibration import STRATA, STRATUM_COLUMNS, THRESHOLDS_PATH, StratifiedSketches, save_thresholds
+from utils.schema import read_table
+
+# -----------------------------
+# Streaming, stratified threshold calibration
+# -----------------------------
+# python calibrate_threshold.py --input data/raw_psv --workers 8 --quantile 0.99 --strata unit age iculos
+# Each worker sketches the reconstruction errors of its own shard of patient files;
+# the parent merges the sketches, so no error array is ever materialized.
+
+_state = {}
+
+
+def _init_worker(model_dir, strata, relative_accuracy, exclude_septic):
+    import torch
+    torch.set_num_threads(1)
+    from utils.scoring import load_artifacts
+    _state.update(artifacts=load_artifacts(model_dir), strata=strata,
+                  relative_accuracy=relative_accuracy, exclude_septic=exclude_septic)
+
+
+def sketch_files(paths):
+    from utils.scoring import columns, recon_errors
+    model, scaler, _ = _state['artifacts']
+    sketches = StratifiedSketches(_state['strata'], _state['relative_accuracy'])
+    wanted = columns + ['SepsisLabel'] + [c for s in _state['strata'] for c in STRATUM_COLUMNS[s]]
+    for path in paths:
+        df = read_table(path, wanted)
+        if _state['exclude_septic'] and 'SepsisLabel' in df:
+            df = df[df['SepsisLabel'] == 0]
+        X = df[columns].ffill().bfill().to_numpy(dtype=np.float64)
+        errors, _ = recon_errors(model, scaler, X)
+        sketches.add(errors, df)
+    return sketches.to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate (stratified) anomaly thresholds with mergeable sketches")
+    parser.add_argument('--input', default='data/raw_psv', help="folder of .psv or .csv patient files")
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--output', default=THRESHOLDS_PATH)
+    parser.add_argument('--quantile', type=float, default=0.99)
+    parser.add_argument('--strata', nargs='*', default=STRATA, choices=STRATA)
+    parser.add_argument('--min-count', type=int, default=500, help="rows needed for a stratum's own threshold")
+    parser.add_argument('--relative-accuracy', type=float, default=0.005)
+    parser.add_argument('--exclude-septic', action='store_true', help="calibrate on SepsisLabel == 0 rows only")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--files-per-task', type=int, default=500)
+    args = parser.parse_args()
+
+    files = sorted(os.path.join(args.input, f) for f in os.listdir(args.input) if f.endswith(('.psv', '.csv')))
+    tasks = [files[i:i + args.files_per_task] for i in range(0, len(files), args.files_per_task)]
+
+    start = time.perf_counter()
+    merged = StratifiedSketches(args.strata, args.relative_accuracy)
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                             initargs=(args.model_dir, args.strata, args.relative_accuracy, args.exclude_septic)) as pool:
+        for result in pool.map(sketch_files, tasks):
+            merged.merge(StratifiedSketches.from_dict(result))
+    elapsed = time.perf_counter() - start
+
+    from model.bundle import load_bundle
+    version = load_bundle(os.path.join(args.model_dir, "vae_bundle.pt")).version
+    thresholds = merged.thresholds(args.quantile, args.min_count)
+    save_thresholds(args.output, thresholds, merged, args.quantile, args.min_count, version)
+
+    print(f"✅ Sketched {merged.overall.count} errors from {len(files)} files in {elapsed:.2f}s "
+          f"({merged.overall.count / max(elapsed, 1e-9):,.0f} rows/sec)")
+    print(f"Global {args.quantile:.0%} threshold: {thresholds.overall:.4f}")
+    for label in sorted(merged.sketches):
+        own = thresholds.per_stratum.get(label)
+        print(f"  {label:28s} n={merged.sketches[label].count:8d}  "
+              + (f"threshold={own:.4f}" if own is not None else "(uses global)"))
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from utils.evaluation import EVALUATION_PATH, MethodStats, patient_timing
+from utils.calibration import STRATUM_COLUMNS
+from utils.schema import read_table
+from model.precision import PRECISIONS
+from utils.rules import BUILTIN_RULE_SETS, RuleSet
+from utils.instrumentation import REGISTRY, add_arguments, instrumented, timer
+
+# -----------------------------
+# Evaluation against SepsisLabel
+# -----------------------------
+# python evaluate.py --input data/holdout_psv --workers 8 --rules physionet_score qsofa sirs
+# Every hourly row of every patient is scored by the VAE and by each rule set. Workers
+# score their own batches of patient files and return mergeable accumulators, so the
+# parent never holds per-row arrays.
+
+_state = {}
+
+
+def _init_worker(model_dir, rules, thresholds_path, precision):
+    import torch
+    torch.set_num_threads(1)
+    from utils.scoring import load_artifacts
+    _state.update(artifacts=load_artifacts(model_dir, precision), rules=[RuleSet.builtin(name) for name in rules],
+                  thresholds=None)
+    if thresholds_path:
+        from model.bundle import load_bundle
+        from utils.calibration import load_thresholds
+        version = load_bundle(os.path.join(model_dir, "vae_bundle.pt")).version
+        _state['thresholds'] = load_thresholds(thresholds_path, version)
+
+
+def evaluate_files(paths):
+    from utils.scoring import columns, recon_errors
+    model, scaler, threshold = _state['artifacts']
+
+    wanted = columns + ['SepsisLabel', 'ICULOS']
+    if _state['thresholds'] is not None:
+        wanted += [c for s in _state['thresholds'].strata for c in STRATUM_COLUMNS[s]]
+    frames, lengths = [], []
+    for path in paths:
+        with timer('file_parse_seconds'):
+            df = read_table(path, wanted)
+        with timer('preprocess_seconds'):
+            df[columns] = df[columns].ffill().bfill()
+        frames.append(df)
+        lengths.append(len(df))
+    df = pd.concat(frames, ignore_index=True)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    labels = df['SepsisLabel'].to_numpy(dtype=np.int8)
+    t, t_sepsis, septic = patient_timing(labels, offsets)
+    X = df[columns].to_numpy(dtype=np.float64)
+
+    stats = {}
+    errors, _ = recon_errors(model, scaler, X)
+    cutoff = _state['thresholds'].lookup(df) if _state['thresholds'] is not None else threshold
+    stats['vae'] = MethodStats().add(errors, errors > cutoff, labels, t, t_sepsis, septic)
+    for rules in _state['rules']:
+        result = rules.evaluate(X, columns)
+        stats[rules.name] = MethodStats().add(result['score'], result['detected'], labels, t, t_sepsis, septic)
+    # Worker-side stage timings go back with the results and are merged in the parent
+    timings = REGISTRY.snapshot()
+    REGISTRY.reset()
+    return {name: s.to_dict() for name, s in stats.items()}, len(paths), len(df), timings
+
+
+def roc_points(stats, n_points=50):
+    # Downsampled ROC curve for plotting
+    fpr, tpr = stats.roc_curve()
+    keep = np.unique(np.linspace(0, len(fpr) - 1, min(n_points, len(fpr))).astype(int))
+    return {'fpr': fpr[keep].round(4).tolist(), 'tpr': tpr[keep].round(4).tolist()}
+
+
+def run(args):
+    files = sorted(os.path.join(args.input, f) for f in os.listdir(args.input) if f.endswith(('.psv', '.csv')))
+    tasks = [files[i:i + args.files_per_task] for i in range(0, len(files), args.files_per_task)]
+
+    start = time.perf_counter()
+    merged, n_patients, n_rows = {}, 0, 0
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                             initargs=(args.model_dir, args.rules, args.thresholds, args.precision)) as pool:
+        for result, patients, rows, timings in pool.map(evaluate_files, tasks):
+            REGISTRY.merge(timings)
+            for name, d in result.items():
+                s = MethodStats.from_dict(d)
+                merged[name] = merged[name].merge(s) if name in merged else s
+            n_patients += patients
+            n_rows += rows
+    elapsed = time.perf_counter() - start
+
+    from model.bundle import load_bundle
+    version = load_bundle(os.path.join(args.model_dir, "vae_bundle.pt")).version
+    report = {
+        'model_version': version,
+        'precision': args.precision,
+        'input': args.input,
+        'thresholds': args.thresholds,
+        'patients': n_patients,
+        'rows': n_rows,
+        'septic_rows': merged['vae'].tp + merged['vae'].fn,
+        'methods': {name: s.summary() for name, s in merged.items()},
+        'roc': {name: roc_points(s) for name, s in merged.items()},
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    print(f"✅ Evaluated {n_rows} rows from {n_patients} patients in {elapsed:.2f}s "
+          f"({n_rows / max(elapsed, 1e-9):,.0f} rows/sec), {report['septic_rows']} septic rows")
+    print(f"{'method':16s} {'AUROC':>7} {'AUPRC':>7} {'prec':>7} {'recall':>7} {'F1':>7} {'utility':>8}")
+    for name, m in report['methods'].items():
+        print(f"{name:16s} {m['auroc']:>7.3f} {m['auprc']:>7.3f} {m['precision']:>7.3f} "
+              f"{m['recall']:>7.3f} {m['f1']:>7.3f} {m['utility']:>8.3f}")
+    print(f"Saved to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the VAE and rule baselines against SepsisLabel")
+    parser.add_argument('--input', default='data/raw_psv', help="folder of held-out .psv or .csv patient files")
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--precision', choices=PRECISIONS, default='fp32', help="inference precision (see model/precision.py)")
+    parser.add_argument('--rules', nargs='+', default=['physionet_score', 'qsofa', 'sirs'],
+                        choices=list(BUILTIN_RULE_SETS))
+    parser.add_argument('--thresholds', default=None,
+                        help="stratified thresholds from calibrate_threshold.py (default: the bundle's global threshold)")
+    parser.add_argument('--output', default=EVALUATION_PATH)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--files-per-task', type=int, default=200)
+    add_arguments(parser)
+    args = parser.parse_args()
+    with instrumented(args, 'evaluate'):
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+
+# -----------------------------
+# Load generator for serve.py
+# -----------------------------
+# python load_test.py --concurrency 64 --duration 10 --rows-per-request 1
+# Each client keeps one keep-alive connection and fires requests back to back.
+
+HEALTHY = [80.0, 98.0, 16.0, 36.8, 90.0, 7.0, 250.0]
+
+
+def make_body(rows, rng):
+    X = np.array(HEALTHY) * rng.normal(1.0, 0.1, size=(rows, len(HEALTHY)))
+    if rows == 1:
+        keys = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
+        return '/score', json.dumps(dict(zip(keys, X[0].round(2).tolist()))).encode()
+    return '/score/batch', json.dumps({'rows': X.round(2).tolist()}).encode()
+
+
+async def request(reader, writer, host, method, path, body=b''):
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    data = await reader.readexactly(length) if length else b''
+    return status, data
+
+
+async def client(host, port, deadline, rows, seed, latencies, errors):
+    rng = np.random.default_rng(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path, body = make_body(rows, rng)
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, 'POST', path, body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    await asyncio.gather(*[client(args.host, args.port, deadline, args.rows_per_request, i, latencies, errors)
+                           for i in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, data = await request(reader, writer, args.host, 'GET', '/metrics')
+    writer.close()
+
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    print(f"Requests: {len(latencies)} ({len(errors)} errors) from {args.concurrency} clients in {elapsed:.1f}s")
+    print(f"Client latency: p50 {np.percentile(lat, 50):.2f} ms, p99 {np.percentile(lat, 99):.2f} ms")
+    print(f"Throughput: {len(latencies) / elapsed:,.0f} requests/sec, "
+          f"{len(latencies) * args.rows_per_request / elapsed:,.0f} rows/sec")
+    print(f"Server metrics: {json.loads(data)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the scoring service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--rows-per-request', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
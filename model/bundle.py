@@ -0,0 +1,162 @@
+import hashlib
+import os
+import numpy as np
+import torch
+from model.vae_model import VAE, DEFAULT_HIDDEN_DIMS
+from model.precision import convert_model
+
+# Single-file model bundle: weights, scaler range, threshold, columns and dims,
+# stamped with a version hash so train/serve mismatches are caught at load time.
+BUNDLE_PATH = "saved_models/vae_bundle.pt"
+BUNDLE_FORMAT = 1
+
+# Column order used before bundles existed (train_vae.py / app.py)
+LEGACY_COLUMNS = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
+LEGACY_LATENT_DIM = 8
+
+
+class MinMaxParams:
+    # The part of a fitted MinMaxScaler needed at serving time: X * scale_ + min_
+    def __init__(self, min_, scale_):
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+
+class ModelBundle:
+    def __init__(self, model, scaler, threshold, columns, input_dim, latent_dim, version,
+                 hidden_dims=DEFAULT_HIDDEN_DIMS):
+        self.model = model
+        self.scaler = scaler
+        self.threshold = threshold
+        self.columns = list(columns)
+        self.input_dim = input_dim
+        self.latent_dim = latent_dim
+        self.hidden_dims = tuple(hidden_dims)
+        self.version = version
+        self.precision = 'fp32'
+
+    def check_columns(self, columns):
+        if list(columns) != self.columns:
+            raise ValueError(f"Model bundle {self.version} was trained on columns {self.columns}, got {list(columns)}")
+
+
+def bundle_version(state_dict, scaler_min, scaler_scale, threshold, columns, input_dim, latent_dim,
+                   hidden_dims=DEFAULT_HIDDEN_DIMS):
+    h = hashlib.sha256()
+    for key in sorted(state_dict):
+        h.update(key.encode())
+        h.update(state_dict[key].detach().cpu().numpy().tobytes())
+    h.update(np.asarray(scaler_min, dtype=np.float64).tobytes())
+    h.update(np.asarray(scaler_scale, dtype=np.float64).tobytes())
+    h.update(repr((float(threshold), list(columns), int(input_dim), int(latent_dim))).encode())
+    # Only non-default widths are hashed, so bundles written before they existed keep their version
+    if tuple(hidden_dims) != DEFAULT_HIDDEN_DIMS:
+        h.update(repr(tuple(int(w) for w in hidden_dims)).encode())
+    return h.hexdigest()[:12]
+
+
+# -----------------------------
+# Writing
+# -----------------------------
+def save_bundle(model, scaler, threshold, columns, latent_dim, path=BUNDLE_PATH):
+    state_dict = {k: v.detach().cpu() for k, v in model.state_dict().items()}
+    input_dim = len(columns)
+    hidden_dims = model.hidden_dims
+    version = bundle_version(state_dict, scaler.min_, scaler.scale_, threshold, columns, input_dim, latent_dim,
+                             hidden_dims)
+
+    torch.save({
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'state_dict': state_dict,
+        'scaler_min': torch.tensor(np.asarray(scaler.min_, dtype=np.float64)),
+        'scaler_scale': torch.tensor(np.asarray(scaler.scale_, dtype=np.float64)),
+        'threshold': float(threshold),
+        'columns': list(columns),
+        'input_dim': input_dim,
+        'latent_dim': int(latent_dim),
+        'hidden_dims': [int(w) for w in hidden_dims],
+    }, path)
+    return version
+
+
+# -----------------------------
+# Loading (cached per process)
+# -----------------------------
+_cache = {}
+
+
+def _file_key(paths):
+    return tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+
+
+def _read_bundle(path):
+    raw = torch.load(path, map_location='cpu')
+    if raw.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"{path}: unsupported bundle format {raw.get('format')}")
+    if len(raw['columns']) != raw['input_dim']:
+        raise ValueError(f"{path}: {len(raw['columns'])} columns but input_dim={raw['input_dim']}")
+
+    hidden_dims = tuple(raw.get('hidden_dims', DEFAULT_HIDDEN_DIMS))
+    version = bundle_version(raw['state_dict'], raw['scaler_min'].numpy(), raw['scaler_scale'].numpy(),
+                             raw['threshold'], raw['columns'], raw['input_dim'], raw['latent_dim'], hidden_dims)
+    if version != raw['version']:
+        raise ValueError(f"{path}: version hash mismatch (stored {raw['version']}, computed {version})")
+
+    model = VAE(raw['input_dim'], raw['latent_dim'], hidden_dims)
+    model.load_state_dict(raw['state_dict'])  # strict: shapes must match the dims
+    model.eval()
+    scaler = MinMaxParams(raw['scaler_min'].numpy(), raw['scaler_scale'].numpy())
+    return ModelBundle(model, scaler, raw['threshold'], raw['columns'],
+                       raw['input_dim'], raw['latent_dim'], raw['version'], hidden_dims)
+
+
+def _read_legacy(model_dir):
+    import joblib
+    fitted = joblib.load(os.path.join(model_dir, "scaler.joblib"))
+    threshold = float(joblib.load(os.path.join(model_dir, "threshold.joblib")))
+    state_dict = torch.load(os.path.join(model_dir, "vae_trained.pt"), map_location='cpu')
+
+    input_dim = len(LEGACY_COLUMNS)
+    if fitted.n_features_in_ != input_dim:
+        raise ValueError(f"Legacy scaler has {fitted.n_features_in_} features, expected {input_dim}")
+    model = VAE(input_dim, LEGACY_LATENT_DIM)
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    version = bundle_version(state_dict, fitted.min_, fitted.scale_, threshold,
+                             LEGACY_COLUMNS, input_dim, LEGACY_LATENT_DIM)
+    return ModelBundle(model, MinMaxParams(fitted.min_, fitted.scale_), threshold,
+                       LEGACY_COLUMNS, input_dim, LEGACY_LATENT_DIM, version)
+
+
+def load_bundle(path=BUNDLE_PATH, precision='fp32'):
+    # Returns the cached bundle unless the file changed on disk since the last load.
+    # Falls back to the separate vae_trained.pt / scaler.joblib / threshold.joblib
+    # files when no bundle has been written yet. precision: see model/precision.py;
+    # the version always identifies the fp32 weights the variant was derived from.
+    if os.path.exists(path):
+        sources = [path]
+        reader = lambda: _read_bundle(path)
+    else:
+        model_dir = os.path.dirname(path) or '.'
+        sources = [os.path.join(model_dir, f) for f in ("vae_trained.pt", "scaler.joblib", "threshold.joblib")]
+        reader = lambda: _read_legacy(model_dir)
+
+    key = (os.path.abspath(path), precision)
+    stamp = _file_key(sources)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    bundle = reader()
+    bundle.model = convert_model(bundle.model, precision)
+    bundle.precision = precision
+    _cache[key] = (stamp, bundle)
+    return bundle
@@ -0,0 +1,88 @@
+import numpy as np
+
+# Torch-free inference for the VAE in model/vae_model.py.
+# The weight pack is a plain .npz with the state dict arrays plus the scaler range,
+# threshold, columns and bundle version; loading and scoring only need NumPy.
+# Only the deterministic path (encoder -> mu -> decoder) is exported.
+WEIGHTS_PATH = "saved_models/vae_numpy.npz"
+
+
+def _layer_names(weights, prefix):
+    # Linear layers of an nn.Sequential in order, e.g. ['encoder.0', 'encoder.2']
+    idx = sorted(int(k.split('.')[1]) for k in weights if k.startswith(prefix + '.') and k.endswith('.weight'))
+    return [f"{prefix}.{i}" for i in idx]
+
+
+def export_weights(bundle, path=WEIGHTS_PATH, dtype=np.float32):
+    # bundle: model.bundle.ModelBundle (export is the only step that needs torch)
+    state = {k: v.detach().cpu().numpy().astype(dtype) for k, v in bundle.model.state_dict().items()
+             if not k.startswith('logvar_layer')}
+    np.savez(path, **state,
+             scaler_min=bundle.scaler.min_, scaler_scale=bundle.scaler.scale_,
+             threshold=np.float64(bundle.threshold), columns=np.array(bundle.columns),
+             version=np.array(bundle.version))
+    return path
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    # Split by sign so exp never overflows
+    out = np.empty_like(x)
+    pos = x >= 0
+    out[pos] = 1.0 / (1.0 + np.exp(-x[pos]))
+    e = np.exp(x[~pos])
+    out[~pos] = e / (1.0 + e)
+    return out
+
+
+class NumpyVAE:
+    def __init__(self, weights, scaler_min, scaler_scale, threshold, columns, version):
+        self.weights = weights
+        self.scaler_min = scaler_min
+        self.scaler_scale = scaler_scale
+        self.threshold = threshold
+        self.columns = columns
+        self.version = version
+        self.dtype = weights['mu_layer.weight'].dtype
+        self.encoder = _layer_names(weights, 'encoder')
+        self.decoder = _layer_names(weights, 'decoder')
+        # Pre-transposed so every layer is a single x @ W + b
+        self.layers = {name: (weights[name + '.weight'].T.copy(), weights[name + '.bias'])
+                       for name in self.encoder + ['mu_layer'] + self.decoder}
+
+    @classmethod
+    def load(cls, path=WEIGHTS_PATH):
+        with np.load(path, allow_pickle=False) as f:
+            weights = {k: f[k] for k in f.files if k.endswith(('.weight', '.bias'))}
+            return cls(weights, f['scaler_min'], f['scaler_scale'], float(f['threshold']),
+                       [str(c) for c in f['columns']], str(f['version']))
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) * self.scaler_scale + self.scaler_min).astype(self.dtype)
+
+    def _linear(self, name, x):
+        W, b = self.layers[name]
+        out = x @ W
+        out += b
+        return out
+
+    def encode(self, x):
+        h = x
+        for name in self.encoder:
+            h = _relu(self._linear(name, h))
+        return self._linear('mu_layer', h)
+
+    def reconstruct(self, x):
+        h = self.encode(x)
+        for name in self.decoder[:-1]:
+            h = _relu(self._linear(name, h))
+        return _sigmoid(self._linear(self.decoder[-1], h))
+
+    def recon_error(self, x):
+        # x is already scaled (same contract as VAE.recon_error)
+        x = np.asarray(x, dtype=self.dtype)
+        diff = x - self.reconstruct(x)
+        return np.einsum('ij,ij->i', diff, diff)
@@ -0,0 +1,57 @@
+import copy
+import warnings
+import torch
+import torch.nn as nn
+
+# Reduced-precision inference variants of the VAE, chosen when the bundle is loaded:
+#   fp32  the trained model as is
+#   int8  dynamic quantization: int8 Linear weights, activations quantized per batch
+#   fp16 / bf16  weights and activations in half precision
+# Every variant takes and returns float32 tensors so callers (scoring, serving) do not
+# change; deterministic errors are summed in float32 so only the network itself drifts.
+PRECISIONS = ('fp32', 'int8', 'fp16', 'bf16')
+HALF_DTYPES = {'fp16': torch.float16, 'bf16': torch.bfloat16}
+
+
+class HalfPrecisionVAE(nn.Module):
+    def __init__(self, model, dtype):
+        super().__init__()
+        self.model = copy.deepcopy(model).to(dtype).eval()
+        self.dtype = dtype
+
+    @torch.no_grad()
+    def reconstruct(self, x):
+        return self.model.reconstruct(x.to(self.dtype)).float()
+
+    @torch.no_grad()
+    def recon_error(self, x):
+        return torch.sum((x - self.reconstruct(x)) ** 2, dim=1)
+
+    @torch.no_grad()
+    def mc_recon_error(self, x, samples=10):
+        mean, var = self.model.mc_recon_error(x.to(self.dtype), samples)
+        return mean.float(), var.float()
+
+    @torch.no_grad()
+    def embed(self, x):
+        return self.model.embed(x.to(self.dtype)).float()
+
+
+def quantize_int8(model):
+    # torch.ao.quantization is being superseded by torchao, which is not a dependency here;
+    # its deprecation warnings are silenced for this call only
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        warnings.simplefilter('ignore', UserWarning)
+        quantized = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+    return quantized.eval()
+
+
+def convert_model(model, precision='fp32'):
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+    if precision == 'fp32':
+        return model
+    if precision == 'int8':
+        return quantize_int8(model)
+    return HalfPrecisionVAE(model, HALF_DTYPES[precision])
@@ -0,0 +1,238 @@
+import os
+import socket
+import time
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import BatchSampler, DataLoader, RandomSampler, TensorDataset
+from utils.instrumentation import count, observe, timer
+from utils.preprocessing import load_patients, scaler_from_range
+
+loss_fn = nn.MSELoss(reduction='sum')
+
+
+def vae_loss(recon_x, x, mu, logvar):
+    recon_loss = loss_fn(recon_x, x)
+    kl_loss = -0.5 * torch.sum(1 + logvar - mu.pow(2) - logvar.exp())
+    return recon_loss + kl_loss
+
+
+def evaluate(model, data, batch_size=65536):
+    # Mean per-row reconstruction loss, decoded deterministically from mu
+    model.eval()
+    total = 0.0
+    for start in range(0, len(data), batch_size):
+        total += model.recon_error(data[start:start + batch_size]).sum().item()
+    return total / max(len(data), 1)
+
+
+def save_checkpoint(path, state):
+    tmp = path + '.tmp'
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Mini-batch training loop
+# -----------------------------
+def train(model, train_data, val_data, epochs=50, batch_size=256, lr=1e-3,
+          num_workers=0, num_threads=None, patience=5, min_delta=0.0,
+          checkpoint_path=None, checkpoint_every=1, resume=False, seed=42, optimizer=None, log=print):
+    # optimizer: pass a (warm-started) optimizer over model.parameters() to continue from its state
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    torch.manual_seed(seed)
+
+    if optimizer is None:
+        optimizer = optim.Adam(model.parameters(), lr=lr)
+    generator = torch.Generator().manual_seed(seed)
+    # Whole batches are sliced out of the tensor in one indexing op instead of
+    # collating batch_size single rows
+    sampler = BatchSampler(RandomSampler(train_data, generator=generator), batch_size, drop_last=False)
+    loader = DataLoader(TensorDataset(train_data), sampler=sampler, batch_size=None,
+                        num_workers=num_workers, persistent_workers=num_workers > 0)
+
+    start_epoch = 0
+    best_val = float('inf')
+    best_state = None
+    bad_epochs = 0
+    history = []
+
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        ckpt = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+        model.load_state_dict(ckpt['model'])
+        optimizer.load_state_dict(ckpt['optimizer'])
+        generator.set_state(ckpt['generator'])
+        start_epoch = ckpt['epoch'] + 1
+        best_val, best_state = ckpt['best_val'], ckpt['best_state']
+        bad_epochs, history = ckpt['bad_epochs'], ckpt['history']
+        log(f"Resumed from {checkpoint_path} at epoch {start_epoch + 1}")
+
+    for epoch in range(start_epoch, epochs):
+        model.train()
+        t0 = time.perf_counter()
+        train_loss = 0.0
+        for (batch,) in loader:
+            optimizer.zero_grad()
+            recon, mu, logvar = model(batch)
+            loss = vae_loss(recon, batch, mu, logvar)
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item()
+        elapsed = time.perf_counter() - t0
+        observe('train_epoch_seconds', elapsed)
+        count('train_samples_total', len(train_data))
+
+        with timer('validation_seconds'):
+            val_loss = evaluate(model, val_data)
+        train_loss /= max(len(train_data), 1)
+        history.append({'epoch': epoch + 1, 'train_loss': train_loss, 'val_loss': val_loss,
+                        'samples_per_sec': len(train_data) / max(elapsed, 1e-9)})
+        log(f"Epoch {epoch+1}/{epochs} - Train Loss: {train_loss:.4f}, Val Recon Loss: {val_loss:.4f}, "
+            f"{history[-1]['samples_per_sec']:,.0f} samples/sec")
+
+        if val_loss < best_val - min_delta:
+            best_val = val_loss
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            bad_epochs = 0
+        else:
+            bad_epochs += 1
+
+        stop = patience and bad_epochs >= patience
+        if checkpoint_path and ((epoch + 1) % checkpoint_every == 0 or stop or epoch + 1 == epochs):
+            save_checkpoint(checkpoint_path, {
+                'epoch': epoch, 'model': model.state_dict(), 'optimizer': optimizer.state_dict(),
+                'generator': generator.get_state(), 'best_val': best_val, 'best_state': best_state,
+                'bad_epochs': bad_epochs, 'history': history,
+            })
+        if stop:
+            log(f"Early stopping: no improvement for {patience} epochs (best val loss {best_val:.4f})")
+            break
+
+    # Keep the weights from the best validation epoch
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.eval()
+    return history
+
+
+# -----------------------------
+# Data-parallel training (torch.distributed, gloo)
+# -----------------------------
+# N local processes each hold one shard of the patients and a replica of the model;
+# DistributedDataParallel averages gradients across replicas after every backward pass,
+# so all replicas take identical optimizer steps. Each rank processes batch_size rows
+# per step (global batch = N * batch_size).
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_data_parallel(fn, nprocs, *args):
+    # Runs fn(rank, world_size, port, queue, *args) in nprocs processes and returns
+    # whatever rank 0 put on the queue (keep it small: it is read after the join)
+    queue = mp.get_context('spawn').SimpleQueue()
+    mp.spawn(fn, args=(nprocs, free_port(), queue) + args, nprocs=nprocs, join=True)
+    return None if queue.empty() else queue.get()
+
+
+def init_process_group(rank, world_size, port, threads=0):
+    # One intra-op thread pool per rank, sized so the ranks share the machine's cores
+    torch.set_num_threads(threads or max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group('gloo', init_method=f'tcp://127.0.0.1:{port}', rank=rank, world_size=world_size)
+
+
+def all_reduce(values, op=dist.ReduceOp.SUM):
+    t = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(t, op=op)
+    return t.tolist()
+
+
+def load_shard(source, selected_columns, patients, rank, world_size):
+    # Patients are dealt round-robin, so shards have similar sizes and no patient is split.
+    # Returns (scaled float32 tensor, scaler); the scaler is the same on every rank and the
+    # same as single-process training: the global per-column range.
+    X = load_patients(source, selected_columns, sorted(patients)[rank::world_size])
+    if not len(X):
+        raise RuntimeError(f"rank {rank} has no training rows; use fewer processes than patients")
+    data_min, data_max = torch.from_numpy(X.min(axis=0)), torch.from_numpy(X.max(axis=0))
+    dist.all_reduce(data_min, dist.ReduceOp.MIN)
+    dist.all_reduce(data_max, dist.ReduceOp.MAX)
+    scaler = scaler_from_range(data_min.numpy(), data_max.numpy())
+    return torch.from_numpy(scaler.transform(X).astype('float32')), scaler
+
+
+def shard_indices(n_rows, n_steps, batch_size, generator):
+    # A fresh permutation of the local rows, cycled so every rank runs the same number
+    # of steps per epoch (DDP needs every rank in every gradient all-reduce)
+    perms = [torch.randperm(n_rows, generator=generator)
+             for _ in range(-(-n_steps * batch_size // n_rows))]
+    return torch.cat(perms)[:n_steps * batch_size]
+
+
+def train_data_parallel(model, train_data, val_data, epochs=50, batch_size=256, lr=1e-3,
+                        patience=5, min_delta=0.0, seed=42, optimizer=None, log=print):
+    # Call inside an initialized process group; returns the same history as train()
+    rank = dist.get_rank()
+    torch.manual_seed(seed)
+    ddp = DistributedDataParallel(model)   # broadcasts rank 0's initial weights
+    if optimizer is None:
+        optimizer = optim.Adam(model.parameters(), lr=lr)
+    torch.manual_seed(seed + rank)         # independent reparameterization noise per rank
+    generator = torch.Generator().manual_seed(seed + rank)
+
+    largest = int(all_reduce([len(train_data)], dist.ReduceOp.MAX)[0])
+    n_steps = -(-largest // batch_size)
+    best_val = float('inf')
+    best_state = None
+    bad_epochs = 0
+    history = []
+
+    for epoch in range(epochs):
+        ddp.train()
+        t0 = time.perf_counter()
+        train_loss = 0.0
+        order = shard_indices(len(train_data), n_steps, batch_size, generator)
+        for step in range(n_steps):
+            batch = train_data[order[step * batch_size:(step + 1) * batch_size]]
+            optimizer.zero_grad()
+            recon, mu, logvar = ddp(batch)
+            loss = vae_loss(recon, batch, mu, logvar)
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item()
+        train_loss, rows = all_reduce([train_loss, n_steps * batch_size])
+        elapsed = all_reduce([time.perf_counter() - t0], dist.ReduceOp.MAX)[0]
+        observe('train_epoch_seconds', elapsed)
+        count('train_samples_total', n_steps * batch_size)
+
+        # Global validation loss, identical on every rank so early stopping agrees
+        with timer('validation_seconds'):
+            val_sum, val_rows = all_reduce([evaluate(model, val_data) * len(val_data), len(val_data)])
+        val_loss = val_sum / max(val_rows, 1)
+        train_loss /= max(rows, 1)
+        history.append({'epoch': epoch + 1, 'train_loss': train_loss, 'val_loss': val_loss,
+                        'samples_per_sec': rows / max(elapsed, 1e-9)})
+        if rank == 0:
+            log(f"Epoch {epoch+1}/{epochs} - Train Loss: {train_loss:.4f}, Val Recon Loss: {val_loss:.4f}, "
+                f"{history[-1]['samples_per_sec']:,.0f} samples/sec ({dist.get_world_size()} ranks)")
+
+        if val_loss < best_val - min_delta:
+            best_val = val_loss
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            bad_epochs = 0
+        else:
+            bad_epochs += 1
+        if patience and bad_epochs >= patience:
+            if rank == 0:
+                log(f"Early stopping: no improvement for {patience} epochs (best val loss {best_val:.4f})")
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.eval()
+    return history
@@ -1,29 +1,34 @@
 import torch
 import torch.nn as nn
 
+# Encoder widths used before they were configurable (input -> 16 -> 8 -> latent)
+DEFAULT_HIDDEN_DIMS = (16, 8)
+
+
 class VAE(nn.Module):
-    def __init__(self, input_dim, latent_dim):
+    def __init__(self, input_dim, latent_dim, hidden_dims=DEFAULT_HIDDEN_DIMS):
         super(VAE, self).__init__()
-        
-        # Encoder
-        self.encoder = nn.Sequential(
-            nn.Linear(input_dim, 16),
-            nn.ReLU(),
-            nn.Linear(16, 8),
-            nn.ReLU(),
-        )
-        self.mu_layer = nn.Linear(8, latent_dim)
-        self.logvar_layer = nn.Linear(8, latent_dim)
+        self.hidden_dims = tuple(hidden_dims)
+
+        # Encoder (the decoder mirrors it); with the default widths the layer names
+        # match the original state dicts: encoder.0/.2, decoder.0/.2/.4
+        layers = []
+        prev = input_dim
+        for width in self.hidden_dims:
+            layers += [nn.Linear(prev, width), nn.ReLU()]
+            prev = width
+        self.encoder = nn.Sequential(*layers)
+        self.mu_layer = nn.Linear(prev, latent_dim)
+        self.logvar_layer = nn.Linear(prev, latent_dim)
 
         # Decoder
-        self.decoder = nn.Sequential(
-            nn.Linear(latent_dim, 8),
-            nn.ReLU(),
-            nn.Linear(8, 16),
-            nn.ReLU(),
-            nn.Linear(16, input_dim),
-            nn.Sigmoid()  # since input is scaled 0-1
-        )
+        layers = []
+        prev = latent_dim
+        for width in reversed(self.hidden_dims):
+            layers += [nn.Linear(prev, width), nn.ReLU()]
+            prev = width
+        layers += [nn.Linear(prev, input_dim), nn.Sigmoid()]  # since input is scaled 0-1
+        self.decoder = nn.Sequential(*layers)
 
     def reparameterize(self, mu, logvar):
         std = torch.exp(0.5 * logvar)
@@ -37,3 +42,36 @@ class VAE(nn.Module):
         z = self.reparameterize(mu, logvar)
         decoded = self.decoder(z)
         return decoded, mu, logvar
+
+    # -----------------------------
+    # Inference
+    # -----------------------------
+    @torch.no_grad()
+    def reconstruct(self, x):
+        # Deterministic: decode from mu, skipping the RNG and the logvar head
+        return self.decoder(self.mu_layer(self.encoder(x)))
+
+    @torch.no_grad()
+    def recon_error(self, x):
+        return torch.sum((x - self.reconstruct(x)) ** 2, dim=1)
+
+    @torch.no_grad()
+    def embed(self, x):
+        # Latent mean per row, the coordinates of the similar-patient index
+        return self.mu_layer(self.encoder(x))
+
+    @torch.no_grad()
+    def mc_recon_error(self, x, samples=10):
+        # Monte Carlo: K latent draws per row, decoded as one (N*K, latent_dim) batch.
+        # Returns the per-row mean error and its variance across the draws.
+        encoded = self.encoder(x)
+        mu = self.mu_layer(encoded)
+        std = torch.exp(0.5 * self.logvar_layer(encoded))
+
+        n, latent_dim = mu.shape
+        eps = torch.randn(n, samples, latent_dim, dtype=mu.dtype, device=mu.device)
+        z = (mu.unsqueeze(1) + eps * std.unsqueeze(1)).reshape(n * samples, latent_dim)
+        recon = self.decoder(z).reshape(n, samples, -1)
+
+        errors = torch.sum((x.unsqueeze(1) - recon) ** 2, dim=2)
+        return errors.mean(dim=1), errors.var(dim=1, unbiased=False)
@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+import numpy as np
+from model.bundle import load_bundle
+from model.precision import PRECISIONS
+from utils.scoring import columns, score_rows
+from utils.instrumentation import REGISTRY, count, gauge, observe
+
+# -----------------------------
+# Local HTTP scoring service
+# -----------------------------
+# python serve.py --port 8000 --max-wait-ms 5 --max-batch 4096
+#   GET  /health        model version
+#   POST /score         {"HR": 80, "O2Sat": 98, ...}            -> one result
+#   POST /score/batch   {"rows": [{...}, ...]} or [[80, 98, ...], ...] -> list of results
+#   GET  /metrics       latency p50/p99, throughput, batch sizes
+#   GET  /metrics/prometheus   the same plus stage histograms, Prometheus text format
+# Concurrent requests are coalesced into one forward pass: the batcher waits at most
+# max_wait_ms after the first queued request, or until max_batch rows are queued.
+
+STATUS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          500: 'Internal Server Error'}
+
+
+class Stats:
+    def __init__(self, size=10000):
+        self.latencies = deque(maxlen=size)
+        self.batch_sizes = deque(maxlen=size)
+        self.requests = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def snapshot(self):
+        lat = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        elapsed = time.perf_counter() - self.started
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'latency_ms_p50': float(np.percentile(lat, 50)),
+            'latency_ms_p99': float(np.percentile(lat, 99)),
+            'requests_per_sec': self.requests / max(elapsed, 1e-9),
+            'rows_per_sec': self.rows / max(elapsed, 1e-9),
+            'mean_batch_rows': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+        }
+
+
+class MicroBatcher:
+    def __init__(self, model, scaler, threshold, max_wait_ms=5.0, max_batch=4096, stats=None):
+        self.model = model
+        self.scaler = scaler
+        self.threshold = threshold
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.stats = stats
+        self.queue = asyncio.Queue()
+
+    async def score(self, X):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            n = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while n < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                n += len(item[0])
+
+            X = np.vstack([x for x, _ in items])
+            try:
+                # Forward pass off the event loop so sockets keep being served
+                scores = await loop.run_in_executor(None, score_rows, self.model, self.scaler, self.threshold, X)
+            except Exception as e:
+                for _, future in items:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                continue
+            if self.stats is not None:
+                self.stats.batch_sizes.append(len(X))
+
+            start = 0
+            for x, future in items:
+                part = {k: v[start:start + len(x)] for k, v in scores.items()}
+                start += len(x)
+                if not future.cancelled():
+                    future.set_result(part)
+
+
+def parse_rows(payload):
+    rows = payload['rows'] if isinstance(payload, dict) and 'rows' in payload else payload
+    if isinstance(rows, dict):
+        rows = [rows]
+    X = np.full((len(rows), len(columns)), np.nan, dtype=np.float64)
+    for i, row in enumerate(rows):
+        if isinstance(row, dict):
+            for j, c in enumerate(columns):
+                if row.get(c) is not None:
+                    X[i, j] = float(row[c])
+        else:
+            if len(row) != len(columns):
+                raise ValueError(f"expected {len(columns)} values {columns}, got {len(row)}")
+            X[i] = [np.nan if v is None else float(v) for v in row]
+    return X
+
+
+def to_results(scores):
+    return [{
+        'recon_error': None if np.isnan(e) else float(e),
+        'vae_flag': bool(v),
+        'physio_score': int(p),
+        'physio_flag': bool(f),
+    } for e, v, p, f in zip(scores['recon_error'], scores['vae_flag'], scores['physio_score'], scores['physio_flag'])]
+
+
+class ScoringServer:
+    def __init__(self, batcher, stats, version):
+        self.batcher = batcher
+        self.stats = stats
+        self.version = version
+
+    async def handle(self, method, path, body):
+        if method == 'OPTIONS':
+            return 204, None
+        if path == '/health':
+            return 200, {'status': 'ok', 'model_version': self.version}
+        if path == '/metrics':
+            return 200, self.stats.snapshot()
+        if path == '/metrics/prometheus':
+            for key, value in self.stats.snapshot().items():
+                gauge('serve_' + key, value)
+            return 200, REGISTRY.prometheus_text()
+        if path not in ('/score', '/score/batch'):
+            return 404, {'error': f"unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "use POST"}
+
+        try:
+            X = parse_rows(json.loads(body or b'null'))
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {'error': str(e)}
+        if not len(X):
+            return 400, {'error': "no rows to score"}
+        if path == '/score' and len(X) > 1:
+            return 400, {'error': f"/score takes one row, got {len(X)}; use /score/batch for several"}
+        results = to_results(await self.batcher.score(X))
+        self.stats.rows += len(X)
+        return 200, results[0] if path == '/score' else {'results': results}
+
+    async def connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+
+                try:
+                    status, payload = await self.handle(method, path.split('?')[0], body)
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                if isinstance(payload, str):
+                    content_type, data = 'text/plain; version=0.0.4', payload.encode()
+                else:
+                    content_type, data = 'application/json', json.dumps(payload).encode() if payload is not None else b''
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write((
+                    f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    "Access-Control-Allow-Origin: *\r\n"
+                    "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+                    "Access-Control-Allow-Headers: Content-Type\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                ).encode() + data)
+                await writer.drain()
+
+                if path.startswith('/score'):
+                    latency = time.perf_counter() - start
+                    self.stats.requests += 1
+                    self.stats.latencies.append(latency)
+                    observe('request_seconds', latency, path=path.split('?')[0])
+                    count('requests_total', path=path.split('?')[0], status=status)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, model_dir, max_wait_ms, max_batch, precision='fp32'):
+    bundle = load_bundle(os.path.join(model_dir, "vae_bundle.pt"), precision)
+    bundle.check_columns(columns)
+    version = bundle.version
+
+    stats = Stats()
+    batcher = MicroBatcher(bundle.model, bundle.scaler, bundle.threshold, max_wait_ms, max_batch, stats)
+    app = ScoringServer(batcher, stats, version)
+    batch_task = asyncio.create_task(batcher.run())
+
+    server = await asyncio.start_server(app.connection, host, port)
+    print(f"✅ Scoring service (model {version}, {precision}) on http://{host}:{port} "
+          f"(max wait {max_wait_ms} ms, max batch {max_batch} rows)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP scoring service with dynamic micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help="coalescing window after the first request")
+    parser.add_argument('--max-batch', type=int, default=4096, help="rows per forward pass")
+    parser.add_argument('--precision', choices=PRECISIONS, default='fp32', help="inference precision (see model/precision.py)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.model_dir, args.max_wait_ms, args.max_batch, args.precision))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from sklearn.metrics import average_precision_score, roc_auc_score
+from utils.preprocessing import is_store, list_patients
+from utils.cache import add_cache_arguments, cache_from_args, load_training_matrix
+
+# -----------------------------
+# Parallel hyperparameter sweep
+# -----------------------------
+# python sweep_vae.py --latent-dims 2 4 8 --hidden 16x8 32x16 --lrs 1e-3 3e-3 --epochs 30 --workers 4
+# The scaled matrix is copied into one shared-memory block; every worker maps it
+# read-only instead of receiving its own copy. Each configuration trains in a worker,
+# configurations are ranked by validation reconstruction loss and detection metrics
+# against SepsisLabel, and the winner is saved through train_vae's save path, so the
+# bundle, legacy artifacts and --incremental training state all carry its version.
+
+columns = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
+store_path = 'data/patient_store'
+RESULTS_PATH = 'outputs/sweep_results.json'
+
+_state = {}
+
+
+def _init_worker(shm_name, shape, n_train, y_val, threads):
+    import torch
+    torch.set_num_threads(threads)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    X = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    _state.update(shm=shm, train=torch.from_numpy(X[:n_train]), val=torch.from_numpy(X[n_train:]), y_val=y_val)
+
+
+def train_config(config):
+    import torch
+    import torch.optim as optim
+    from model.vae_model import VAE
+    from model.training import train
+    from utils.sketch import QuantileSketch
+
+    start = time.perf_counter()
+    torch.manual_seed(config['seed'])
+    model = VAE(len(columns), config['latent_dim'], config['hidden_dims'])
+    optimizer = optim.Adam(model.parameters(), lr=config['lr'])
+    history = train(model, _state['train'], _state['val'], epochs=config['epochs'],
+                    batch_size=config['batch_size'], lr=config['lr'], patience=config['patience'],
+                    seed=config['seed'], optimizer=optimizer, log=lambda *_: None)
+
+    val, y_val = _state['val'], _state['y_val']
+    errors = np.concatenate([model.recon_error(val[i:i + 65536]).numpy() for i in range(0, len(val), 65536)])
+    # Same threshold rule as train_vae.py
+    threshold = float(QuantileSketch().add(errors).quantile(0.99))
+    flags = errors > threshold
+    tp = int((flags & (y_val == 1)).sum())
+    both_classes = 0 < y_val.sum() < len(y_val)
+
+    return {
+        'config': config,
+        'val_loss': float(errors.mean()),
+        'auroc': float(roc_auc_score(y_val, errors)) if both_classes else float('nan'),
+        'auprc': float(average_precision_score(y_val, errors)) if both_classes else float('nan'),
+        'precision': tp / max(int(flags.sum()), 1),
+        'recall': tp / max(int(y_val.sum()), 1),
+        'threshold': threshold,
+        'epochs_run': len(history),
+        'seconds': time.perf_counter() - start,
+        'state_dict': {k: v.numpy() for k, v in model.state_dict().items()},
+        'optimizer_state': optimizer.state_dict(),
+    }
+
+
+def rank(results, by):
+    # 'combined' averages the rank by val_loss (lower is better) and by AUROC (higher is better);
+    # without both label classes AUROC is NaN and only val_loss counts
+    by_loss = np.argsort(np.argsort([r['val_loss'] for r in results]))
+    auroc = np.array([r['auroc'] for r in results])
+    if by == 'val_loss' or np.isnan(auroc).all():
+        key = by_loss
+    else:
+        by_auroc = np.argsort(np.argsort(-np.nan_to_num(auroc, nan=-1.0)))
+        key = by_auroc if by == 'auroc' else (by_loss + by_auroc) / 2
+    return [results[i] for i in np.lexsort(([r['val_loss'] for r in results], key))]
+
+
+def parse_hidden(text):
+    return tuple(int(w) for w in text.split('x'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train VAE configurations in parallel and keep the best one")
+    parser.add_argument('--source', default=None, help="patient store or folder of CSVs (default: store if built)")
+    parser.add_argument('--latent-dims', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--hidden', type=parse_hidden, nargs='+', default=[(16, 8), (32, 16)],
+                        help="encoder widths, e.g. 16x8 32x16x8")
+    parser.add_argument('--lrs', type=float, nargs='+', default=[1e-3, 3e-3])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[256])
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--patience', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=1, help="torch threads per worker")
+    parser.add_argument('--rank-by', choices=['combined', 'val_loss', 'auroc'], default='combined')
+    parser.add_argument('--results', default=RESULTS_PATH)
+    parser.add_argument('--no-save', action='store_true', help="only report, keep the current serving bundle")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    source = args.source or (store_path if is_store(store_path) else 'data/converted_csvs')
+    patients = list_patients(source)
+    X_scaled, y, scaler = load_training_matrix(source, columns, cache_from_args(args))
+    print(f"Loaded {X_scaled.shape} from {source} ({int(y.sum())} septic rows)")
+
+    # Same 80/20 split for every configuration: train rows first, then validation rows,
+    # so workers slice both out of the shared block without copying
+    order = np.random.default_rng(args.seed).permutation(len(X_scaled))
+    n_train = int(len(order) * 0.8)
+    y_val = y[order[n_train:]]
+
+    configs = [{'latent_dim': latent, 'hidden_dims': list(hidden), 'lr': lr, 'batch_size': batch_size,
+                'epochs': args.epochs, 'patience': args.patience, 'seed': args.seed}
+               for latent, hidden, lr, batch_size
+               in itertools.product(args.latent_dims, args.hidden, args.lrs, args.batch_sizes)]
+
+    shm = shared_memory.SharedMemory(create=True, size=X_scaled.nbytes)
+    try:
+        shared = np.ndarray(X_scaled.shape, dtype=np.float32, buffer=shm.buf)
+        np.take(X_scaled, order, axis=0, out=shared)
+        del X_scaled
+
+        print(f"Training {len(configs)} configurations on {args.workers} workers "
+              f"({shm.size / 1e6:.1f} MB shared)...")
+        start = time.perf_counter()
+        results = []
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                                 initargs=(shm.name, shared.shape, n_train, y_val, args.threads)) as pool:
+            for result in pool.map(train_config, configs):
+                results.append(result)
+                c = result['config']
+                print(f"  latent={c['latent_dim']} hidden={c['hidden_dims']} lr={c['lr']:g} "
+                      f"-> val_loss={result['val_loss']:.5f} auroc={result['auroc']:.3f} "
+                      f"({result['epochs_run']} epochs, {result['seconds']:.1f}s)")
+        elapsed = time.perf_counter() - start
+        # The winner's threshold is recalibrated on the same validation rows when it is saved
+        val = None if args.no_save else shared[n_train:].copy()
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    ranked = rank(results, args.rank_by)
+    print(f"✅ Sweep finished in {elapsed:.1f}s "
+          f"({sum(r['seconds'] for r in results) / max(elapsed, 1e-9):.1f}x vs sequential)")
+    print(f"{'#':>3} {'latent':>6} {'hidden':>12} {'lr':>8} {'val_loss':>10} {'auroc':>7} {'auprc':>7} "
+          f"{'prec':>6} {'recall':>6}")
+    for i, r in enumerate(ranked, 1):
+        c = r['config']
+        print(f"{i:>3} {c['latent_dim']:>6} {'x'.join(map(str, c['hidden_dims'])):>12} {c['lr']:>8g} "
+              f"{r['val_loss']:>10.5f} {r['auroc']:>7.3f} {r['auprc']:>7.3f} {r['precision']:>6.3f} {r['recall']:>6.3f}")
+
+    os.makedirs(os.path.dirname(args.results) or '.', exist_ok=True)
+    with open(args.results, 'w') as f:
+        json.dump({'source': source, 'rank_by': args.rank_by, 'rows': int(len(order)),
+                   'results': [{k: v for k, v in r.items() if k not in ('state_dict', 'optimizer_state')}
+                               for r in ranked]}, f, indent=1)
+    print(f"Results saved to {args.results}")
+
+    if args.no_save:
+        return
+
+    import torch
+    import torch.optim as optim
+    from model.vae_model import VAE
+    from train_vae import save_artifacts, save_training_state
+
+    best = ranked[0]
+    c = best['config']
+    model = VAE(len(columns), c['latent_dim'], c['hidden_dims'])
+    model.load_state_dict({k: torch.from_numpy(v) for k, v in best['state_dict'].items()})
+    optimizer = optim.Adam(model.parameters(), lr=c['lr'])
+    optimizer.load_state_dict(best['optimizer_state'])
+    model.eval()
+    os.makedirs("saved_models", exist_ok=True)
+    version, _ = save_artifacts(model, scaler, torch.from_numpy(val), c['latent_dim'])
+    save_training_state(optimizer, version, source, patients)
+    print(f"✅ Winner (latent={c['latent_dim']}, hidden={c['hidden_dims']}, lr={c['lr']:g}) "
+          f"saved to saved_models/vae_bundle.pt (version {version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,7 @@
 # train_data, val_data = train_test_split(X_tensor, test_size=0.2, random_state=42)
 
 # # Model, loss, optimizer
-# input_dim = X.shape[1]
+# input_dim = X_scaled.shape[1]
 # latent_dim = 8  # can increase later
 # model = VAE(input_dim, latent_dim)
 # optimizer = optim.Adam(model.parameters(), lr=1e-3)
@@ -72,89 +72,271 @@
 
 # print(f"✅ Model, scaler, and threshold saved to saved_models/ (threshold={threshold:.4f})")
 
+import argparse
+import json
+import time
 import torch
-import torch.nn as nn
 import torch.optim as optim
 from model.vae_model import VAE
-from utils.preprocessing import preprocess_all_csvs
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
+from model.bundle import BUNDLE_PATH, save_bundle, load_bundle
+from model.numpy_vae import export_weights
+from model.training import init_process_group, load_shard, spawn_data_parallel, train, train_data_parallel
+from utils.preprocessing import is_store, list_patients, load_patients, scaler_from_range, train_val_split
+from utils.cache import add_cache_arguments, cache_from_args, load_training_matrix
+from utils.sketch import QuantileSketch
+from utils.instrumentation import REGISTRY, add_arguments, instrumented
 import joblib
 import numpy as np
 import os
 
-# Ensure save directory exists
-os.makedirs("saved_models", exist_ok=True)
-
-# -----------------------------
-# Load and preprocess data
-# -----------------------------
 columns = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
-X, _ = preprocess_all_csvs('data/converted_csvs', columns)
-print("Shape of preprocessed data:", X.shape)
+store_path = 'data/patient_store'  # written by: python convert_psv_to_csv.py --store data/patient_store
 
-# Normalize data
-scaler = MinMaxScaler()
-X_scaled = scaler.fit_transform(X)
+# Written after every run so --incremental knows what the current model has seen
+TRAINED_PATIENTS_PATH = 'saved_models/trained_patients.json'
+OPTIMIZER_PATH = 'saved_models/optimizer.pt'
 
-# Convert to torch tensors
-X_tensor = torch.tensor(X_scaled, dtype=torch.float32)
-train_data, val_data = train_test_split(X_tensor, test_size=0.2, random_state=42)
 
-# -----------------------------
-# VAE model
-# -----------------------------
-input_dim = X.shape[1]
-latent_dim = 8
-model = VAE(input_dim, latent_dim)
-optimizer = optim.Adam(model.parameters(), lr=1e-3)
-loss_fn = nn.MSELoss(reduction='sum')
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the sepsis VAE")
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--latent-dim', type=int, default=8)
+    parser.add_argument('--hidden-dims', type=int, nargs='+', default=[16, 8], help="encoder widths (decoder mirrors)")
+    parser.add_argument('--workers', type=int, default=0, help="DataLoader worker processes")
+    parser.add_argument('--threads', type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument('--nproc', type=int, default=1,
+                        help="data-parallel training processes (torch.distributed, gloo), each on a shard of the patients")
+    parser.add_argument('--patience', type=int, default=5, help="early stopping patience in epochs (0 = off)")
+    parser.add_argument('--checkpoint', default='saved_models/train_checkpoint.pt')
+    parser.add_argument('--checkpoint-every', type=int, default=1)
+    parser.add_argument('--resume', action='store_true', help="continue from --checkpoint")
+    parser.add_argument('--incremental', action='store_true',
+                        help="fine-tune the current model on patients added since the last run")
+    parser.add_argument('--replay-ratio', type=float, default=1.0,
+                        help="--incremental: previously trained patients replayed per new patient")
+    add_cache_arguments(parser)
+    add_arguments(parser)
+    return parser.parse_args()
+
+
+def data_source():
+    return store_path if is_store(store_path) else 'data/converted_csvs'
+
+
+def load_data(cache=None):
+    # Streams the source twice (fit the scaler, then transform into one float32 buffer);
+    # the saved scaler maps raw vitals to 0-1. A cache hit skips both passes.
+    X_scaled, _, scaler = load_training_matrix(data_source(), columns, cache)
+    return X_scaled, scaler
 
-def vae_loss(recon_x, x, mu, logvar):
-    recon_loss = loss_fn(recon_x, x)
-    kl_loss = -0.5 * torch.sum(1 + logvar - mu.pow(2) - logvar.exp())
-    return recon_loss + kl_loss
 
 # -----------------------------
-# Training loop
+# Saving
 # -----------------------------
-epochs = 50
-for epoch in range(epochs):
-    model.train()
-    optimizer.zero_grad()
-    recon, mu, logvar = model(train_data)
-    loss = vae_loss(recon, train_data, mu, logvar)
-    loss.backward()
-    optimizer.step()
+def save_artifacts(model, scaler, val_data, latent_dim):
+    if not len(val_data):
+        raise ValueError("No validation rows to calibrate the threshold on; the cohort is too small to split")
+    torch.save(model.state_dict(), "saved_models/vae_trained.pt")
+    joblib.dump(scaler, "saved_models/scaler.joblib")
 
+    # -----------------------------
+    # Compute safe threshold
+    # -----------------------------
+    # Validation errors are streamed through a quantile sketch in batches
+    # (deterministic, reproducible); see calibrate_threshold.py for stratified cutoffs
     model.eval()
-    with torch.no_grad():
-        val_recon, _, _ = model(val_data)
-        val_loss = loss_fn(val_recon, val_data)
+    sketch = QuantileSketch()
+    for start in range(0, len(val_data), 65536):
+        errors = model.recon_error(val_data[start:start + 65536]).numpy()
+        sketch.add(errors)
+        if start == 0:
+            recon_errors = errors
 
-    print(f"Epoch {epoch+1}/{epochs} - Train Loss: {loss.item():.2f}, Val Recon Loss: {val_loss.item():.2f}")
+    # Use 99th percentile to avoid false positives for normal patients
+    threshold = np.float32(sketch.quantile(0.99))
+    joblib.dump(threshold, "saved_models/threshold.joblib")
+    print(f"✅ Model, scaler, and threshold saved to saved_models/ (threshold={threshold:.4f})")
+
+    # Single-file bundle used by app.py and the scoring tools
+    version = save_bundle(model, scaler, threshold, columns, latent_dim)
+    print(f"✅ Model bundle saved to saved_models/vae_bundle.pt (version {version})")
+
+    # Torch-free weight pack for lightweight serving
+    print(f"✅ NumPy weight pack saved to {export_weights(load_bundle())}")
+    return version, recon_errors
+
+
+def save_training_state(optimizer, version, source, patients):
+    torch.save({'version': version, 'state': optimizer.state_dict()}, OPTIMIZER_PATH)
+    with open(TRAINED_PATIENTS_PATH, 'w') as f:
+        json.dump({'bundle_version': version, 'source': source, 'patients': patients}, f)
 
-# -----------------------------
-# Save model and scaler
-# -----------------------------
-torch.save(model.state_dict(), "saved_models/vae_trained.pt")
-joblib.dump(scaler, "saved_models/scaler.joblib")
 
 # -----------------------------
-# Compute safe threshold
+# Incremental (warm-start) training
 # -----------------------------
-model.eval()
-with torch.no_grad():
-    val_recon, _, _ = model(val_data)
-    recon_errors = torch.sum((val_data - val_recon) ** 2, dim=1).numpy()
+def rescale_input_layer(model, old_scaler, new_scaler):
+    # Fold the scaler change into the first encoder layer so the warm-started model
+    # sees the same encoder inputs as before: x_old = r * x_new + (min_old - r * min_new)
+    r = torch.tensor(old_scaler.scale_ / new_scaler.scale_, dtype=torch.float32)
+    shift = torch.tensor(old_scaler.min_ - (old_scaler.scale_ / new_scaler.scale_) * new_scaler.min_,
+                         dtype=torch.float32)
+    first = model.encoder[0]
+    with torch.no_grad():
+        first.bias += first.weight @ shift
+        first.weight *= r
+
+
+def train_incremental(args):
+    # Cost scales with the new patients (+ replay sample), not with the whole history
+    if not (os.path.exists(TRAINED_PATIENTS_PATH) and os.path.exists(BUNDLE_PATH)):
+        print("No previous training state found; running a full training instead")
+        return False
+    start = time.perf_counter()
+    with open(TRAINED_PATIENTS_PATH) as f:
+        trained = json.load(f)
+    bundle = load_bundle()
+    bundle.check_columns(columns)
+    if trained['bundle_version'] != bundle.version:
+        print(f"Warning: {TRAINED_PATIENTS_PATH} was written for model {trained['bundle_version']}, "
+              f"current model is {bundle.version}")
+
+    source = data_source()
+    current = list_patients(source)
+    new = [p for p, stamp in current.items() if trained['patients'].get(p) != stamp]
+    if not new:
+        print(f"✅ No new patients since the last run ({len(current)} already trained)")
+        return True
+    new_set = set(new)
+    old = [p for p in current if p in trained['patients'] and p not in new_set]
+    n_replay = min(len(old), int(np.ceil(len(new) * args.replay_ratio)))
+    replay = list(np.random.default_rng(len(trained['patients'])).choice(old, n_replay, replace=False)) if n_replay else []
+
+    X_new = load_patients(source, columns, new)
+    X_replay = load_patients(source, columns, replay)
+    print(f"New patients: {len(new)} ({len(X_new)} rows), replay: {len(replay)} ({len(X_replay)} rows)")
+
+    # Widen the serving scaler's range with the new rows only
+    old_scaler = bundle.scaler
+    data_min = -old_scaler.min_ / old_scaler.scale_
+    data_max = data_min + 1 / old_scaler.scale_
+    if len(X_new):
+        data_min = np.minimum(data_min, X_new.min(axis=0))
+        data_max = np.maximum(data_max, X_new.max(axis=0))
+    scaler = scaler_from_range(data_min, data_max)
+
+    model = bundle.model
+    rescale_input_layer(model, old_scaler, scaler)
+    optimizer = optim.Adam(model.parameters(), lr=args.lr)
+    if os.path.exists(OPTIMIZER_PATH):
+        saved = torch.load(OPTIMIZER_PATH, map_location='cpu', weights_only=False)
+        if saved['version'] == bundle.version:
+            optimizer.load_state_dict(saved['state'])
+            for group in optimizer.param_groups:
+                group['lr'] = args.lr
+
+    X_scaled = scaler.transform(np.vstack([X_new, X_replay])).astype(np.float32)
+    train_data, val_data = train_val_split(torch.from_numpy(X_scaled))
+    train(model, train_data, val_data, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+          num_workers=args.workers, num_threads=args.threads, patience=args.patience, optimizer=optimizer)
+
+    version, _ = save_artifacts(model, scaler, val_data, bundle.latent_dim)
+    save_training_state(optimizer, version, source, {**trained['patients'], **{p: current[p] for p in new}})
+    print(f"✅ Incremental update done in {time.perf_counter() - start:.1f}s")
+    return True
 
-# Use 99th percentile to avoid false positives for normal patients
-threshold = np.percentile(recon_errors, 99)
-joblib.dump(threshold, "saved_models/threshold.joblib")
-print(f"✅ Model, scaler, and threshold saved to saved_models/ (threshold={threshold:.4f})")
 
 # -----------------------------
-# Optional: print some example recon errors
+# Data-parallel training
 # -----------------------------
-print("Sample reconstruction errors (first 10 validation samples):")
-print(recon_errors[:10])
+def _data_parallel_worker(rank, world_size, port, queue, args, source, patients):
+    init_process_group(rank, world_size, port, args.threads)
+    try:
+        X_scaled, scaler = load_shard(source, columns, patients, rank, world_size)
+        train_data, val_data = train_val_split(X_scaled)
+        if rank == 0:
+            print(f"{world_size} ranks, {len(patients)} patients; rank 0 shard: {len(X_scaled)} rows")
+
+        model = VAE(X_scaled.shape[1], args.latent_dim, args.hidden_dims)
+        optimizer = optim.Adam(model.parameters(), lr=args.lr)
+        train_data_parallel(model, train_data, val_data, epochs=args.epochs, batch_size=args.batch_size,
+                            lr=args.lr, patience=args.patience, optimizer=optimizer)
+
+        # Rank 0 computes the threshold over every rank's validation rows and saves
+        vals = [None] * world_size if rank == 0 else None
+        torch.distributed.gather_object(val_data, vals, dst=0)
+        if rank == 0:
+            version, recon_errors = save_artifacts(model, scaler, torch.cat(vals), args.latent_dim)
+            save_training_state(optimizer, version, source, patients)
+            print("Sample reconstruction errors (first 10 validation samples):")
+            print(recon_errors[:10])
+            queue.put(REGISTRY.snapshot())
+        torch.distributed.barrier()
+    finally:
+        torch.distributed.destroy_process_group()
+
+
+def run_data_parallel(args):
+    source = data_source()
+    patients = list_patients(source)
+    snapshot = spawn_data_parallel(_data_parallel_worker, args.nproc, args, source, patients)
+    if snapshot:
+        REGISTRY.merge(snapshot)
+
+
+def run(args):
+    # Ensure save directory exists
+    os.makedirs("saved_models", exist_ok=True)
+
+    if args.incremental and train_incremental(args):
+        return
+    if args.nproc > 1:
+        return run_data_parallel(args)
+
+    # -----------------------------
+    # Load and preprocess data
+    # -----------------------------
+    source = data_source()
+    patients = list_patients(source)
+    X_scaled, scaler = load_data(cache_from_args(args))
+    print("Shape of preprocessed data:", X_scaled.shape)
+
+    # Convert to torch tensors (shares memory with X_scaled)
+    X_tensor = torch.from_numpy(X_scaled)
+    train_data, val_data = train_val_split(X_tensor)
+
+    # -----------------------------
+    # VAE model + training loop
+    # -----------------------------
+    input_dim = X_scaled.shape[1]
+    latent_dim = args.latent_dim
+    model = VAE(input_dim, latent_dim, args.hidden_dims)
+    optimizer = optim.Adam(model.parameters(), lr=args.lr)
+    train(model, train_data, val_data, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+          num_workers=args.workers, num_threads=args.threads, patience=args.patience,
+          checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every, resume=args.resume,
+          optimizer=optimizer)
+
+    # -----------------------------
+    # Save model, scaler, threshold and bundle
+    # -----------------------------
+    version, recon_errors = save_artifacts(model, scaler, val_data, latent_dim)
+    save_training_state(optimizer, version, source, patients)
+
+    # -----------------------------
+    # Optional: print some example recon errors
+    # -----------------------------
+    print("Sample reconstruction errors (first 10 validation samples):")
+    print(recon_errors[:10])
+
+
+def main():
+    args = parse_args()
+    with instrumented(args, 'train_vae'):
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
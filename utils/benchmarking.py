@@ -0,0 +1,14 @@
+import time
+
+# Shared by the inference benchmarks (bench_numpy_vae.py, bench_precision.py)
+
+
+def throughput(fn, X, batch_size, min_time=0.5):
+    # Rows/sec of fn over X in batch_size slices, repeated for at least min_time seconds
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        for i in range(0, len(X), batch_size):
+            fn(X[i:i + batch_size])
+        n += len(X)
+    return n / (time.perf_counter() - start)
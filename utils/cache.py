@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import joblib
+import numpy as np
+from utils.instrumentation import count, timer
+from utils.preprocessing import build_training_matrix, is_store, list_patients
+
+# Content-addressed cache of preprocessed training matrices.
+# The key hashes the input manifest (name, size, mtime of every patient file or store
+# array), the column list, the fill strategy and the scaler type, so any change to the
+# data or the preprocessing recipe is a miss. Each entry is a directory
+#   <key>/X.npy  float32 scaled matrix
+#   <key>/y.npy  int8 SepsisLabel per row
+#   <key>/scaler.joblib
+#   <key>/meta.json   (its mtime is the entry's last-used time)
+# and the least recently used entries are evicted once the cache exceeds max_bytes.
+CACHE_DIR = 'data/cache'
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+FILL_STRATEGY = 'ffill+bfill within patient, drop incomplete rows'
+SCALER_TYPE = 'sklearn.preprocessing.MinMaxScaler'
+
+
+def source_fingerprint(source):
+    if is_store(source):
+        files = ['meta.json', 'values.npy', 'offsets.npy', 'labels.npy']
+        return {f: [os.stat(os.path.join(source, f)).st_size, os.stat(os.path.join(source, f)).st_mtime_ns]
+                for f in files}
+    return list_patients(source)
+
+
+def cache_key(source, selected_columns, fill=FILL_STRATEGY, scaler=SCALER_TYPE):
+    recipe = {'format': CACHE_FORMAT, 'source': source_fingerprint(source),
+              'columns': list(selected_columns), 'fill': fill, 'scaler': scaler}
+    return hashlib.sha256(json.dumps(recipe, sort_keys=True).encode()).hexdigest()[:24]
+
+
+class MatrixCache:
+    def __init__(self, path=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def get(self, key):
+        entry = os.path.join(self.path, key)
+        meta_path = os.path.join(entry, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        X = np.load(os.path.join(entry, 'X.npy'))
+        y = np.load(os.path.join(entry, 'y.npy'))
+        scaler = joblib.load(os.path.join(entry, 'scaler.joblib'))
+        os.utime(meta_path)  # mark as recently used
+        return X, y, scaler
+
+    def put(self, key, X, y, scaler, info=None):
+        os.makedirs(self.path, exist_ok=True)
+        entry = os.path.join(self.path, key)
+        # Write into a private directory, then rename: readers never see a partial entry
+        tmp = f"{entry}.tmp{os.getpid()}"
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, 'X.npy'), np.ascontiguousarray(X, dtype=np.float32))
+        np.save(os.path.join(tmp, 'y.npy'), np.asarray(y, dtype=np.int8))
+        joblib.dump(scaler, os.path.join(tmp, 'scaler.joblib'))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'created': time.time(), 'rows': int(len(X)), **(info or {})}, f)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another process stored the same key first
+        self.evict(keep=key)
+
+    def entries(self):
+        # (key, bytes, last_used) of every complete entry
+        out = []
+        if not os.path.isdir(self.path):
+            return out
+        for key in os.listdir(self.path):
+            entry = os.path.join(self.path, key)
+            meta_path = os.path.join(entry, 'meta.json')
+            if '.tmp' in key or not os.path.exists(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            out.append((key, size, os.stat(meta_path).st_mtime))
+        return out
+
+    def evict(self, keep=None):
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+        removed = []
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+            total -= size
+            removed.append(key)
+        count('cache_evictions_total', len(removed))
+        return removed
+
+
+def load_training_matrix(source, selected_columns, cache=None):
+    # (X_scaled, SepsisLabel, scaler), straight from the cache on a hit
+    if cache is None:
+        return build_training_matrix(source, selected_columns)
+    key = cache_key(source, selected_columns)
+    with timer('cache_lookup_seconds'):
+        hit = cache.get(key)
+    if hit is not None:
+        count('cache_hits_total')
+        print(f"✅ Preprocessed matrix loaded from cache ({os.path.join(cache.path, key)})")
+        return hit
+    count('cache_misses_total')
+    X, y, scaler = build_training_matrix(source, selected_columns)
+    cache.put(key, X, y, scaler, {'source': source, 'columns': list(selected_columns)})
+    print(f"Preprocessed matrix cached as {os.path.join(cache.path, key)}")
+    return X, y, scaler
+
+
+def add_cache_arguments(parser):
+    group = parser.add_argument_group('preprocessing cache')
+    group.add_argument('--cache-dir', default=CACHE_DIR)
+    group.add_argument('--cache-max-gb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3)
+    group.add_argument('--no-cache', action='store_true', help="always preprocess from the source files")
+
+
+def cache_from_args(args):
+    return None if args.no_cache else MatrixCache(args.cache_dir, int(args.cache_max_gb * 1024 ** 3))
@@ -0,0 +1,122 @@
+import json
+import numpy as np
+from utils.sketch import QuantileSketch
+
+# Stratified anomaly thresholds. Each stratum (ICU unit, age band, ICULOS bucket, or any
+# combination) gets its own quantile sketch of reconstruction errors; strata with too few
+# rows fall back to the global threshold.
+THRESHOLDS_PATH = "saved_models/thresholds.json"
+
+AGE_BINS = [40, 60, 80]
+AGE_LABELS = ['<40', '40-60', '60-80', '80+']
+ICULOS_BINS = [7, 25, 73]
+ICULOS_LABELS = ['1-6h', '7-24h', '25-72h', '73h+']
+UNIT_LABELS = ['unknown', 'Unit1', 'Unit2']
+STRATA = ['unit', 'age', 'iculos']
+# Patient file columns each stratum is computed from
+STRATUM_COLUMNS = {'unit': ['Unit1', 'Unit2'], 'age': ['Age'], 'iculos': ['ICULOS']}
+
+
+def _codes(data, stratum):
+    if stratum == 'unit':
+        unit1 = np.asarray(data['Unit1'], dtype=np.float64) == 1
+        unit2 = np.asarray(data['Unit2'], dtype=np.float64) == 1
+        return np.where(unit1, 1, np.where(unit2, 2, 0)), UNIT_LABELS
+    if stratum == 'age':
+        return np.digitize(np.asarray(data['Age'], dtype=np.float64), AGE_BINS), AGE_LABELS
+    if stratum == 'iculos':
+        return np.digitize(np.asarray(data['ICULOS'], dtype=np.float64), ICULOS_BINS), ICULOS_LABELS
+    raise ValueError(f"unknown stratum {stratum}")
+
+
+def stratum_codes(data, strata):
+    # One integer code per row for the combined strata, plus a code -> "a|b|c" label map
+    code = 0
+    labels = [[]]
+    for stratum in strata:
+        c, names = _codes(data, stratum)
+        c = c.astype(np.int64)
+        code = code * len(names) + c
+        labels = [prev + [n] for prev in labels for n in names]
+    return code, ['|'.join(parts) for parts in labels]
+
+
+class StratifiedSketches:
+    def __init__(self, strata=STRATA, relative_accuracy=0.005):
+        self.strata = list(strata)
+        self.relative_accuracy = relative_accuracy
+        self.overall = QuantileSketch(relative_accuracy)
+        self.sketches = {}
+
+    def add(self, errors, data):
+        errors = np.asarray(errors, dtype=np.float64)
+        valid = ~np.isnan(errors)
+        self.overall.add(errors[valid])
+        if not self.strata:
+            return self
+        code, labels = stratum_codes(data, self.strata)
+        code, errors = code[valid], errors[valid]
+        for c in np.unique(code):
+            label = labels[c]
+            if label not in self.sketches:
+                self.sketches[label] = QuantileSketch(self.relative_accuracy)
+            self.sketches[label].add(errors[code == c])
+        return self
+
+    def merge(self, other):
+        self.overall.merge(other.overall)
+        for label, sketch in other.sketches.items():
+            if label in self.sketches:
+                self.sketches[label].merge(sketch)
+            else:
+                self.sketches[label] = sketch
+        return self
+
+    def to_dict(self):
+        return {'strata': self.strata, 'relative_accuracy': self.relative_accuracy,
+                'overall': self.overall.to_dict(),
+                'sketches': {k: s.to_dict() for k, s in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        out = cls(d['strata'], d['relative_accuracy'])
+        out.overall = QuantileSketch.from_dict(d['overall'])
+        out.sketches = {k: QuantileSketch.from_dict(s) for k, s in d['sketches'].items()}
+        return out
+
+    def thresholds(self, quantile=0.99, min_count=500):
+        return StratifiedThresholds(
+            self.strata, self.overall.quantile(quantile),
+            {k: s.quantile(quantile) for k, s in self.sketches.items() if s.count >= min_count})
+
+
+class StratifiedThresholds:
+    def __init__(self, strata, overall, per_stratum):
+        self.strata = list(strata)
+        self.overall = float(overall)
+        self.per_stratum = dict(per_stratum)
+
+    def lookup(self, data):
+        # Per-row threshold; strata without their own cutoff use the global one
+        if not self.strata or not self.per_stratum:
+            return np.full(len(np.asarray(data['ICULOS'])), self.overall)
+        code, labels = stratum_codes(data, self.strata)
+        table = np.array([self.per_stratum.get(label, self.overall) for label in labels])
+        return table[code]
+
+
+def save_thresholds(path, thresholds, sketches, quantile, min_count, bundle_version):
+    with open(path, 'w') as f:
+        json.dump({'bundle_version': bundle_version, 'quantile': quantile, 'min_count': min_count,
+                   'strata': thresholds.strata, 'overall': thresholds.overall,
+                   'thresholds': thresholds.per_stratum,
+                   'counts': {k: s.count for k, s in sketches.sketches.items()},
+                   'sketches': sketches.to_dict()}, f, indent=1)
+
+
+def load_thresholds(path=THRESHOLDS_PATH, bundle_version=None):
+    with open(path) as f:
+        d = json.load(f)
+    if bundle_version is not None and d['bundle_version'] != bundle_version:
+        raise ValueError(f"{path} was calibrated for model {d['bundle_version']}, not {bundle_version}")
+    return StratifiedThresholds(d['strata'], d['overall'], d['thresholds'])
@@ -0,0 +1,30 @@
+import numpy as np
+
+# Min/max-preserving downsampling for plotting long series: the x range is cut into
+# buckets and each bucket keeps the positions of its minimum and maximum (in x order),
+# so spikes and dips survive however many points are dropped. Plotting cost is bounded
+# by max_points regardless of the stay length.
+
+
+def minmax_indices(y, max_points=2000):
+    # Sorted indices into y of at most ~max_points points (plus the first and last)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    n_buckets = max(1, max_points // 2)
+    width = -(-n // n_buckets)
+    padded = np.full(n_buckets * width, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, width)
+    # NaN (missing or padding) never wins; an all-NaN bucket keeps its first position
+    lo = np.argmin(np.where(np.isnan(buckets), np.inf, buckets), axis=1)
+    hi = np.argmax(np.where(np.isnan(buckets), -np.inf, buckets), axis=1)
+    base = np.arange(n_buckets) * width
+    keep = np.concatenate([[0, n - 1], base + lo, base + hi])
+    return np.unique(keep[keep < n])
+
+
+def minmax_downsample(x, y, max_points=2000):
+    idx = minmax_indices(y, max_points)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
@@ -0,0 +1,165 @@
+import numpy as np
+from utils.sketch import QuantileSketch
+
+# Mergeable evaluation accumulators. Each worker fills a MethodStats per method from its
+# own patients; the parent merges them, so no per-row array outlives its chunk.
+#   - AUROC / AUPRC from per-class quantile sketches of the score (bucket resolution
+#     = the sketch's relative accuracy; ties within a bucket count as ties)
+#   - confusion counts at the method's operating point (exact)
+#   - PhysioNet 2019 utility, summed per policy and normalized at the end
+EVALUATION_PATH = 'outputs/evaluation.json'
+
+# PhysioNet/CinC 2019 utility parameters (hours relative to t_sepsis)
+DT_EARLY, DT_OPTIMAL, DT_LATE = -12, -6, 3
+MAX_U_TP, MIN_U_FN, U_FP, U_TN = 1.0, -2.0, -0.05, 0.0
+
+
+# -----------------------------
+# Utility score
+# -----------------------------
+def utility(pred, t, t_sepsis, septic):
+    # Per-row utility of binary predictions; t is hours since ICU admission (0-based),
+    # t_sepsis/septic are already broadcast to rows. Same piecewise rules as the
+    # challenge's compute_prediction_utility.
+    m_1 = MAX_U_TP / (DT_OPTIMAL - DT_EARLY)
+    b_1 = -m_1 * DT_EARLY
+    m_2 = -MAX_U_TP / (DT_LATE - DT_OPTIMAL)
+    b_2 = -m_2 * DT_LATE
+    m_3 = MIN_U_FN / (DT_LATE - DT_OPTIMAL)
+    b_3 = -m_3 * DT_OPTIMAL
+
+    dt = t - t_sepsis
+    early = dt <= DT_OPTIMAL
+    window = dt <= DT_LATE
+    tp = np.where(early, np.maximum(m_1 * dt + b_1, U_FP), m_2 * dt + b_2)
+    fn = np.where(early, 0.0, m_3 * dt + b_3)
+    u_septic = np.where(window, np.where(pred, tp, fn), 0.0)
+    return np.where(septic, u_septic, np.where(pred, U_FP, U_TN))
+
+
+def patient_timing(labels, offsets):
+    # Hour index of every row, plus per-row t_sepsis and septic flag for its patient
+    lengths = np.diff(offsets)
+    pid = np.repeat(np.arange(len(lengths)), lengths)
+    t = np.arange(len(labels)) - offsets[:-1][pid]
+    big = np.iinfo(np.int64).max // 2
+    first = np.full(len(lengths), big, dtype=np.int64)
+    np.minimum.at(first, pid, np.where(labels == 1, t, big))
+    septic = first < big
+    # Labels start DT_OPTIMAL hours before onset, so t_sepsis = first positive hour + 6
+    t_sepsis = np.where(septic, first - DT_OPTIMAL, 0)
+    return t, t_sepsis[pid], septic[pid]
+
+
+# -----------------------------
+# Accumulator
+# -----------------------------
+class MethodStats:
+    def __init__(self, relative_accuracy=0.005):
+        self.pos = QuantileSketch(relative_accuracy)
+        self.neg = QuantileSketch(relative_accuracy)
+        self.tp = self.fp = self.fn = self.tn = 0
+        self.unscored = 0
+        self.utility = {'observed': 0.0, 'best': 0.0, 'inaction': 0.0}
+
+    def add(self, score, flag, labels, t, t_sepsis, septic):
+        score = np.asarray(score, dtype=np.float64)
+        positive = labels == 1
+        valid = ~np.isnan(score)
+        self.pos.add(score[valid & positive])
+        self.neg.add(score[valid & ~positive])
+        self.unscored += int((~valid).sum())
+
+        self.tp += int((flag & positive).sum())
+        self.fp += int((flag & ~positive).sum())
+        self.fn += int((~flag & positive).sum())
+        self.tn += int((~flag & ~positive).sum())
+
+        best = septic & (t - t_sepsis >= DT_EARLY) & (t - t_sepsis <= DT_LATE)
+        self.utility['observed'] += float(utility(flag, t, t_sepsis, septic).sum())
+        self.utility['best'] += float(utility(best, t, t_sepsis, septic).sum())
+        self.utility['inaction'] += float(utility(np.zeros_like(flag), t, t_sepsis, septic).sum())
+        return self
+
+    def merge(self, other):
+        self.pos.merge(other.pos)
+        self.neg.merge(other.neg)
+        self.tp += other.tp
+        self.fp += other.fp
+        self.fn += other.fn
+        self.tn += other.tn
+        self.unscored += other.unscored
+        for k in self.utility:
+            self.utility[k] += other.utility[k]
+        return self
+
+    def to_dict(self):
+        return {'pos': self.pos.to_dict(), 'neg': self.neg.to_dict(), 'tp': self.tp, 'fp': self.fp,
+                'fn': self.fn, 'tn': self.tn, 'unscored': self.unscored, 'utility': self.utility}
+
+    @classmethod
+    def from_dict(cls, d):
+        out = cls()
+        out.pos, out.neg = QuantileSketch.from_dict(d['pos']), QuantileSketch.from_dict(d['neg'])
+        out.tp, out.fp, out.fn, out.tn = d['tp'], d['fp'], d['fn'], d['tn']
+        out.unscored, out.utility = d['unscored'], dict(d['utility'])
+        return out
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def _bucket_counts(self):
+        # Positive/negative counts per score bucket, ascending, zero bucket first
+        sketches = [s for s in (self.pos, self.neg) if len(s.counts)]
+        lo = min((s.offset for s in sketches), default=0)
+        hi = max((s.offset + len(s.counts) for s in sketches), default=0)
+        out = []
+        for s in (self.pos, self.neg):
+            counts = np.zeros(hi - lo + 1, dtype=np.float64)
+            counts[0] = s.zero_count
+            if len(s.counts):
+                counts[1 + s.offset - lo:1 + s.offset - lo + len(s.counts)] = s.counts
+            out.append(counts)
+        return out
+
+    def roc_curve(self):
+        pos, neg = self._bucket_counts()
+        # Thresholds from high to low
+        tpr = np.concatenate([[0], np.cumsum(pos[::-1])]) / max(pos.sum(), 1)
+        fpr = np.concatenate([[0], np.cumsum(neg[::-1])]) / max(neg.sum(), 1)
+        return fpr, tpr
+
+    def auroc(self):
+        if not self.pos.count or not self.neg.count:
+            return float('nan')
+        fpr, tpr = self.roc_curve()
+        return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    def auprc(self):
+        # Average precision, a step function over thresholds (ties grouped)
+        if not self.pos.count:
+            return float('nan')
+        pos, neg = self._bucket_counts()
+        tp = np.cumsum(pos[::-1])
+        fp = np.cumsum(neg[::-1])
+        precision = tp / np.maximum(tp + fp, 1)
+        recall_step = pos[::-1] / pos.sum()
+        return float((precision * recall_step).sum())
+
+    def summary(self):
+        precision = self.tp / max(self.tp + self.fp, 1)
+        recall = self.tp / max(self.tp + self.fn, 1)
+        u = self.utility
+        span = u['best'] - u['inaction']
+        return {
+            'rows': self.tp + self.fp + self.fn + self.tn,
+            'unscored_rows': self.unscored,
+            'auroc': self.auroc(),
+            'auprc': self.auprc(),
+            'accuracy': (self.tp + self.tn) / max(self.tp + self.fp + self.fn + self.tn, 1),
+            'precision': precision,
+            'recall': recall,
+            'f1': 2 * precision * recall / max(precision + recall, 1e-12),
+            'utility': (u['observed'] - u['inaction']) / span if span else float('nan'),
+            'tp': self.tp, 'fp': self.fp, 'fn': self.fn, 'tn': self.tn,
+        }
@@ -0,0 +1,158 @@
+import warnings
+import numpy as np
+import pandas as pd
+from utils.preprocessing import segment_ffill
+
+# Per-patient temporal features computed over the whole cohort at once.
+# Rows of patient i are offsets[i]:offsets[i+1] (one row per ICU hour), as in the PatientStore.
+# For every input column the engine emits:
+#   <col>            forward-filled value
+#   <col>_missing    1 if the hour had no measurement
+#   <col>_tsl        hours since the last measurement (NaN until the first one)
+#   <col>_delta      change of the filled value versus the previous hour
+#   <col>_{mean,std,min,max}_<w>  trailing rolling stats of the filled value over w hours
+# Rolling stats cost O(rows) per window regardless of w: mean/std come from
+# cumulative sums, min/max from block prefix/suffix scans (van Herk / Gil-Werman).
+DEFAULT_WINDOWS = (6, 12, 24)
+
+
+def _row_starts(offsets):
+    return np.repeat(offsets[:-1], np.diff(offsets))
+
+
+def time_since_last(X, offsets, seed=None):
+    # seed: per-patient hours since last measurement just before the first row (NaN = never)
+    n, k = X.shape
+    rows = np.arange(n)
+    starts = _row_starts(offsets)
+    last = np.where(~np.isnan(X), rows[:, None], -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    tsl = (rows[:, None] - last).astype(np.float32)
+
+    unseen = last < starts[:, None]
+    if seed is None:
+        tsl[unseen] = np.nan
+    else:
+        seed_rows = np.repeat(np.asarray(seed, dtype=np.float32), np.diff(offsets), axis=0)
+        carried = seed_rows + (rows - starts + 1)[:, None]
+        tsl[unseen] = carried[unseen]
+    return tsl
+
+
+def _rolling_sum_count(V, starts, w):
+    # Trailing window [max(t - w + 1, start), t] sums via one cumulative sum per column
+    n = len(V)
+    rows = np.arange(n)
+    lo = np.maximum(rows - w + 1, starts)
+    valid = ~np.isnan(V)
+    S = np.zeros((n + 1, V.shape[1]))
+    Q = np.zeros((n + 1, V.shape[1]))
+    C = np.zeros((n + 1, V.shape[1]))
+    np.cumsum(np.where(valid, V, 0.0), axis=0, out=S[1:])
+    np.cumsum(np.where(valid, V * V, 0.0), axis=0, out=Q[1:])
+    np.cumsum(valid, axis=0, out=C[1:])
+    return S[rows + 1] - S[lo], Q[rows + 1] - Q[lo], C[rows + 1] - C[lo]
+
+
+def _rolling_extreme(V, offsets, starts, w, op):
+    # Blocks of w rows aligned to each patient's first row: prefix scan g and suffix scan h.
+    # The window max is fmax(h[lo], g[t]), or just g[t] when lo and t share a block.
+    n = len(V)
+    rows = np.arange(n)
+    fill = -np.inf if op == 'max' else np.inf
+    filled = np.where(np.isnan(V), fill, V)
+
+    block = np.cumsum((rows - starts) % w == 0) - 1
+    frame = pd.DataFrame(filled)
+    g = getattr(frame.groupby(block), 'cum' + op)().to_numpy()
+    h = getattr(frame.iloc[::-1].groupby(block[::-1]), 'cum' + op)().to_numpy()[::-1]
+
+    lo = np.maximum(rows - w + 1, starts)
+    combine = np.fmax if op == 'max' else np.fmin
+    out = np.where((block[lo] == block)[:, None], g, combine(h[lo], g))
+    out[np.isinf(out)] = np.nan
+    return out
+
+
+class FeatureEngine:
+    def __init__(self, columns, windows=DEFAULT_WINDOWS):
+        self.columns = list(columns)
+        self.windows = tuple(windows)
+        # Rows of history needed to continue a patient incrementally
+        self.tail_rows = max(max(self.windows) - 1, 1)
+
+    @property
+    def names(self):
+        names = []
+        for suffix in ['', '_missing', '_tsl', '_delta']:
+            names += [c + suffix for c in self.columns]
+        for w in self.windows:
+            for stat in ['mean', 'std', 'min', 'max']:
+                names += [f"{c}_{stat}_{w}" for c in self.columns]
+        return names
+
+    def compute(self, X, offsets, tsl_seed=None):
+        X = np.asarray(X, dtype=np.float32)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        starts = _row_starts(offsets)
+        first = np.arange(len(X)) == starts
+
+        filled = segment_ffill(X, offsets)
+        delta = np.empty_like(filled)
+        delta[1:] = filled[1:] - filled[:-1]
+        delta[first] = np.nan
+
+        blocks = [filled, np.isnan(X).astype(np.float32), time_since_last(X, offsets, tsl_seed), delta]
+
+        # Centre columns before the cumulative sums to keep the variance well conditioned
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+            centre = np.nan_to_num(np.nanmean(filled, axis=0)) if len(filled) else 0.0
+            V = filled.astype(np.float64) - centre
+            for w in self.windows:
+                s, q, c = _rolling_sum_count(V, starts, w)
+                mean = s / c
+                std = np.sqrt(np.maximum(q / c - mean * mean, 0.0))
+                blocks += [mean + centre, std,
+                           _rolling_extreme(filled, offsets, starts, w, 'min'),
+                           _rolling_extreme(filled, offsets, starts, w, 'max')]
+        return np.hstack(blocks).astype(np.float32)
+
+    # -----------------------------
+    # Incremental updates
+    # -----------------------------
+    def update(self, state, patient_ids, X_new, offsets_new):
+        # state: dict patient_id -> (tail of filled rows, hours since last measurement per column).
+        # Features for the new hours match what compute() gives on the full history.
+        tails, seeds, blocks, lengths = [], [], [], []
+        k = len(self.columns)
+        for i, pid in enumerate(patient_ids):
+            tail, tsl = state.get(pid, (np.empty((0, k), dtype=np.float32), np.full(k, np.nan, dtype=np.float32)))
+            new = X_new[offsets_new[i]:offsets_new[i + 1]]
+            tails.append(len(tail))
+            seeds.append(tsl)
+            blocks += [tail, new]
+            lengths.append(len(tail) + len(new))
+
+        combined = np.vstack(blocks).astype(np.float32) if blocks else np.empty((0, k), dtype=np.float32)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        features = self.compute(combined, offsets)
+
+        # Only the new rows are returned; tsl is recomputed from the carried seed
+        tails = np.asarray(tails)
+        keep = np.ones(len(combined), dtype=bool)
+        for start, n_tail in zip(offsets[:-1], tails):
+            keep[start:start + n_tail] = False
+        out = features[keep]
+        tsl = time_since_last(np.asarray(X_new, dtype=np.float32), offsets_new,
+                              np.vstack(seeds) if seeds else None)
+        out[:, 2 * k:3 * k] = tsl
+
+        filled = out[:, :k]
+        for i, pid in enumerate(patient_ids):
+            a, b = offsets_new[i], offsets_new[i + 1]
+            if b == a:
+                continue
+            history = state[pid][0] if pid in state else filled[:0]
+            state[pid] = (np.vstack([history, filled[a:b]])[-self.tail_rows:], tsl[b - 1])
+        return out
@@ -0,0 +1,203 @@
+import contextlib
+import os
+import threading
+import time
+
+# Process-wide counters, gauges and histograms with Prometheus text export.
+#   count('files_parsed_total')                   counter
+#   observe('forward_seconds', 0.012)             histogram
+#   with timer('rule_eval_seconds', rule_set='sirs'): ...   histogram of elapsed seconds
+# Worker processes keep their own registry; return snapshot() from the worker and
+# merge() it in the parent. Recording is a dict lookup under a lock, so it is meant
+# for per-chunk / per-file / per-request events, not per row.
+
+# Seconds, 100 us .. 60 s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = 'sepsis_'
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+class Registry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}   # key -> [bucket counts..., +Inf count], sum
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            i = 0
+            while i < len(self.buckets) and value > self.buckets[i]:
+                i += 1
+            hist[0][i] += 1
+            hist[1] += value
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # -----------------------------
+    # Cross-process aggregation
+    # -----------------------------
+    def snapshot(self):
+        with self.lock:
+            return {'counters': list(self.counters.items()), 'gauges': list(self.gauges.items()),
+                    'histograms': [(k, [list(h[0]), h[1]]) for k, h in self.histograms.items()]}
+
+    def merge(self, snapshot):
+        with self.lock:
+            for key, value in snapshot['counters']:
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, value in snapshot['gauges']:
+                self.gauges[key] = value
+            for key, (counts, total) in snapshot['histograms']:
+                hist = self.histograms.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+                hist[0] = [a + b for a, b in zip(hist[0], counts)]
+                hist[1] += total
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    # -----------------------------
+    # Export
+    # -----------------------------
+    def summary(self):
+        # name{labels} -> (count, total seconds) for the histograms, for console reports
+        with self.lock:
+            return {name + _format_labels(labels): (sum(h[0]), h[1])
+                    for (name, labels), h in sorted(self.histograms.items())}
+
+    def prometheus_text(self):
+        lines = []
+        with self.lock:
+            for kind, table in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({k[0] for k in table}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    for (n, labels), value in sorted(table.items()):
+                        if n == name:
+                            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+            for name in sorted({k[0] for k in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (n, labels), (counts, total) in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, c in zip(list(self.buckets) + ['+Inf'], counts):
+                        cumulative += c
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        # Atomic write, suitable for node_exporter's textfile collector
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+REGISTRY = Registry()
+count = REGISTRY.count
+gauge = REGISTRY.gauge
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+
+
+# -----------------------------
+# Profiling and CLI wiring
+# -----------------------------
+@contextlib.contextmanager
+def profile(mode=None, output=None, top=20):
+    # mode: None, 'cprofile' (call-level CPU time) or 'tracemalloc' (allocation sites, peak)
+    if mode == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if output:
+                profiler.dump_stats(output)
+                print(f"cProfile stats written to {output} (view with: python -m pstats {output})")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+    elif mode == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start(25)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if output:
+                snapshot.dump(output)
+                print(f"tracemalloc snapshot written to {output}")
+            print(f"tracemalloc: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB; top allocation sites:")
+            for stat in snapshot.statistics('lineno')[:top]:
+                print(f"  {stat}")
+    else:
+        yield
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--metrics-file', default=None,
+                       help="write stage timings/counters in Prometheus text format to this file")
+    group.add_argument('--profile', choices=['cprofile', 'tracemalloc'], default=None)
+    group.add_argument('--profile-output', default=None, help="save the raw cProfile stats / tracemalloc snapshot")
+
+
+@contextlib.contextmanager
+def instrumented(args, job):
+    # Wraps an entry point: optional profiling, then a stage timing report and metrics file
+    start = time.perf_counter()
+    try:
+        with profile(args.profile, args.profile_output):
+            yield REGISTRY
+    finally:
+        gauge('job_duration_seconds', time.perf_counter() - start, job=job)
+        gauge('job_last_run_timestamp_seconds', time.time(), job=job)
+        stages = REGISTRY.summary()
+        if stages:
+            print("Stage timings:")
+            for name, (n, total) in stages.items():
+                print(f"  {name:48s} n={n:<8d} total={total:9.3f}s  mean={1000 * total / max(n, 1):9.3f} ms")
+        if args.metrics_file:
+            REGISTRY.write_textfile(args.metrics_file)
+            print(f"Metrics written to {args.metrics_file}")
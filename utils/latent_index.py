@@ -0,0 +1,113 @@
+import os
+import numpy as np
+
+# Nearest-neighbour index over the VAE's latent means (mu), one point per hourly row
+# of the training cohort, with the row's patient, ICU hour, SepsisLabel and whether
+# the patient ever became septic.
+# Insertion is incremental: new rows go to a small unindexed tail that is searched by
+# brute force alongside the KD-tree, and the tree is rebuilt once the tail grows past
+# REBUILD_FRACTION of the indexed rows. Embeddings depend on the encoder weights, so
+# the index records the bundle version it was built with.
+INDEX_PATH = 'saved_models/latent_index.npz'
+REBUILD_FRACTION = 0.1
+MIN_REBUILD_ROWS = 10000
+
+
+def septic_patients(patient_ids, labels):
+    # Per row: 1 if the row's patient has any positive SepsisLabel (-1 if unlabelled)
+    _, inverse = np.unique(patient_ids, return_inverse=True)
+    outcome = np.full(inverse.max() + 1 if len(inverse) else 0, -1, dtype=np.int8)
+    np.maximum.at(outcome, inverse, np.asarray(labels, dtype=np.int8))
+    return outcome[inverse]
+
+
+class LatentIndex:
+    def __init__(self, embeddings, patients, hours, labels, septic, bundle_version, leaf_size=40):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.patients = np.asarray(patients, dtype=str)
+        self.hours = np.asarray(hours, dtype=np.int16)
+        self.labels = np.asarray(labels, dtype=np.int8)
+        self.septic = np.asarray(septic, dtype=np.int8)
+        self.bundle_version = bundle_version
+        self.leaf_size = leaf_size
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def rebuild(self):
+        from sklearn.neighbors import KDTree
+        self.n_indexed = len(self.embeddings)
+        self.tree = KDTree(self.embeddings, leaf_size=self.leaf_size) if self.n_indexed else None
+
+    def patient_set(self):
+        return set(np.unique(self.patients).tolist())
+
+    def add(self, embeddings, patients, hours, labels, septic):
+        self.embeddings = np.concatenate([self.embeddings, np.asarray(embeddings, dtype=np.float32)])
+        self.patients = np.concatenate([self.patients, np.asarray(patients, dtype=str)])
+        self.hours = np.concatenate([self.hours, np.asarray(hours, dtype=np.int16)])
+        self.labels = np.concatenate([self.labels, np.asarray(labels, dtype=np.int8)])
+        self.septic = np.concatenate([self.septic, np.asarray(septic, dtype=np.int8)])
+        pending = len(self) - self.n_indexed
+        if pending > max(MIN_REBUILD_ROWS, REBUILD_FRACTION * self.n_indexed):
+            self.rebuild()
+
+    def query(self, Z, k=10):
+        # (distances, row indices), both (n_queries, k), nearest first
+        Z = np.atleast_2d(np.asarray(Z, dtype=np.float32))
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(Z), 0)), np.empty((len(Z), 0), dtype=np.intp)
+        parts_d, parts_i = [], []
+        if self.tree is not None:
+            d, i = self.tree.query(Z, k=min(k, self.n_indexed))
+            parts_d.append(d)
+            parts_i.append(i)
+        if len(self) > self.n_indexed:
+            tail = self.embeddings[self.n_indexed:]
+            d2 = (Z ** 2).sum(axis=1)[:, None] - 2 * Z @ tail.T + (tail ** 2).sum(axis=1)[None, :]
+            kt = min(k, len(tail))
+            i = np.argpartition(d2, kt - 1, axis=1)[:, :kt]
+            parts_d.append(np.sqrt(np.maximum(np.take_along_axis(d2, i, axis=1), 0)).astype(np.float64))
+            parts_i.append(i + self.n_indexed)
+        d, i = np.hstack(parts_d), np.hstack(parts_i)
+        order = np.argsort(d, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(d, order, axis=1), np.take_along_axis(i, order, axis=1)
+
+    def neighbors(self, z, k=10):
+        # The k most similar historical states to one embedding, with their outcomes
+        d, i = self.query(z, k)
+        return [{'patient': str(self.patients[j]), 'hour': int(self.hours[j]), 'distance': float(dist),
+                 'label': int(self.labels[j]), 'septic': int(self.septic[j])}
+                for dist, j in zip(d[0], i[0])]
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, embeddings=self.embeddings, patients=self.patients, hours=self.hours,
+                 labels=self.labels, septic=self.septic, bundle_version=np.array(self.bundle_version))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, bundle_version=None):
+        with np.load(path) as d:
+            version = str(d['bundle_version'])
+            if bundle_version is not None and version != bundle_version:
+                raise ValueError(f"{path} was built with model {version}, not {bundle_version}")
+            return cls(d['embeddings'], d['patients'], d['hours'], d['labels'], d['septic'], version)
+
+
+_loaded = {}
+
+
+def load_index(path=INDEX_PATH, bundle_version=None):
+    # Cached per process, reloaded only when the file changes (like load_bundle)
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _loaded:
+        _loaded.clear()
+        _loaded[key] = LatentIndex.load(path)
+    index = _loaded[key]
+    if bundle_version is not None and index.bundle_version != bundle_version:
+        raise ValueError(f"{path} was built with model {index.bundle_version}, not {bundle_version}")
+    return index
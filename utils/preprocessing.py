@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
 import os
-from sklearn.preprocessing import MinMaxScaler
+from utils.instrumentation import count, timer
+from utils.schema import read_table
 
 def preprocess_all_csvs(folder_path, selected_columns):
     all_data = []
 
     for file in os.listdir(folder_path):
         if file.endswith('.csv'):
-            df = pd.read_csv(os.path.join(folder_path, file))
+            df = read_table(os.path.join(folder_path, file), selected_columns)
 
             # Select relevant columns and fill missing values
             df = df[selected_columns]
@@ -20,7 +21,176 @@ def preprocess_all_csvs(folder_path, selected_columns):
     full_data = pd.concat(all_data)
 
     # Normalize the features
+    from sklearn.preprocessing import MinMaxScaler
     scaler = MinMaxScaler()
     scaled_data = scaler.fit_transform(full_data)
 
     return scaled_data, scaler
+
+
+# -----------------------------
+# Columnar store path
+# -----------------------------
+def segment_ffill(X, offsets):
+    # Forward fill each column without carrying values across patient boundaries
+    n = len(X)
+    rows = np.arange(n)
+    starts = np.repeat(offsets[:-1], np.diff(offsets))
+    last = np.where(~np.isnan(X), rows[:, None], -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    filled = X[np.maximum(last, 0), np.arange(X.shape[1])]
+    filled[last < starts[:, None]] = np.nan
+    return filled
+
+
+def segment_bfill(X, offsets):
+    n = len(X)
+    rev_offsets = n - offsets[::-1]
+    return segment_ffill(X[::-1], rev_offsets)[::-1]
+
+
+# -----------------------------
+# Streaming (out-of-core) path
+# -----------------------------
+# Two passes over the source, each holding one chunk at a time:
+#   1) fit_scaler: MinMaxScaler.partial_fit over filled chunks
+#   2) iter_scaled_chunks: transform lazily with the fitted scaler
+# source is either a PatientStore directory or a folder of per-patient CSVs.
+def is_store(source):
+    return os.path.exists(os.path.join(source, 'meta.json'))
+
+
+def _iter_store_chunks(store_path, selected_columns, chunk_rows):
+    from utils.store import PatientStore, iter_patient_ranges
+    store = PatientStore(store_path)
+    idx = [store.columns.index(c) for c in selected_columns]
+    offsets = store.offsets
+
+    # Whole patients only, so the fill never crosses a chunk boundary
+    for first, last in iter_patient_ranges(offsets, chunk_rows):
+        local = offsets[first:last + 1] - offsets[first]
+        X = np.asarray(store.values[offsets[first]:offsets[last], idx], dtype=np.float32)
+        y = np.asarray(store.labels[offsets[first]:offsets[last]], dtype=np.int8)
+        with timer('preprocess_seconds'):
+            X = segment_bfill(segment_ffill(X, local), local)
+        yield X, y
+
+
+def _iter_csv_chunks(folder_path, selected_columns, chunk_rows):
+    wanted = list(selected_columns) + ['SepsisLabel']
+    blocks, labels, n = [], [], 0
+    for file in sorted(os.listdir(folder_path)):
+        if file.endswith('.csv'):
+            with timer('file_parse_seconds'):
+                df = read_table(os.path.join(folder_path, file), wanted)
+            count('files_parsed_total')
+            y = df['SepsisLabel'] if 'SepsisLabel' in df else np.zeros(len(df))
+            labels.append(np.asarray(y, dtype=np.int8))
+            with timer('preprocess_seconds'):
+                df = df[selected_columns].ffill().bfill()
+            blocks.append(df.to_numpy(dtype=np.float32))
+            n += len(df)
+            if n >= chunk_rows:
+                yield np.vstack(blocks), np.concatenate(labels)
+                blocks, labels, n = [], [], 0
+    if blocks:
+        yield np.vstack(blocks), np.concatenate(labels)
+
+
+def iter_labeled_chunks(source, selected_columns, chunk_rows=100000):
+    # Yields (X, SepsisLabel) with X filled, unscaled float32 and NaN rows dropped
+    reader = _iter_store_chunks if is_store(source) else _iter_csv_chunks
+    for X, y in reader(source, selected_columns, chunk_rows):
+        keep = ~np.isnan(X).any(axis=1)
+        if keep.any():
+            yield X[keep], y[keep]
+
+
+def iter_chunks(source, selected_columns, chunk_rows=100000):
+    # Yields filled, unscaled float32 chunks of roughly chunk_rows rows
+    for X, _ in iter_labeled_chunks(source, selected_columns, chunk_rows):
+        yield X
+
+
+# sklearn is imported where a scaler is fitted, so scoring-only processes never load it
+def scaler_from_range(data_min, data_max):
+    # A fitted MinMaxScaler with exactly this per-column range
+    from sklearn.preprocessing import MinMaxScaler
+    return MinMaxScaler().fit(np.vstack([data_min, data_max]))
+
+
+def fit_scaler(source, selected_columns, chunk_rows=100000):
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler()
+    n_rows = 0
+    for X in iter_chunks(source, selected_columns, chunk_rows):
+        scaler.partial_fit(X)
+        n_rows += len(X)
+    return scaler, n_rows
+
+
+def iter_scaled_chunks(source, selected_columns, scaler, chunk_rows=100000):
+    for X in iter_chunks(source, selected_columns, chunk_rows):
+        with timer('scaler_transform_seconds'):
+            X = scaler.transform(X).astype(np.float32)
+        yield X
+
+
+def train_val_split(X, test_size=0.2, seed=42):
+    # The same rows as sklearn's train_test_split(X, test_size=test_size, random_state=seed)
+    # (one RandomState permutation, test rows first) without importing sklearn.model_selection
+    n_test = int(np.ceil(test_size * len(X)))
+    perm = np.random.RandomState(seed).permutation(len(X))
+    return X[perm[n_test:]], X[perm[:n_test]]
+
+
+def build_training_matrix(source, selected_columns, chunk_rows=100000):
+    # Both passes into one float32 buffer: (X_scaled, SepsisLabel, fitted scaler).
+    # The scaler is the only scaling step, so it maps raw vitals to 0-1.
+    scaler, n_rows = fit_scaler(source, selected_columns, chunk_rows)
+    X_scaled = np.empty((n_rows, len(selected_columns)), dtype=np.float32)
+    labels = np.empty(n_rows, dtype=np.int8)
+    row = 0
+    for X, y in iter_labeled_chunks(source, selected_columns, chunk_rows):
+        with timer('scaler_transform_seconds'):
+            X_scaled[row:row + len(X)] = scaler.transform(X)
+        labels[row:row + len(X)] = y
+        row += len(X)
+    return X_scaled, labels, scaler
+
+
+# -----------------------------
+# Per-patient access (incremental training)
+# -----------------------------
+def list_patients(source):
+    # Patient id -> stamp used to spot new or changed patients: [size, mtime_ns] of each
+    # CSV, or [row count] for a store (rebuilt wholesale, so ids are what matter there)
+    if is_store(source):
+        from utils.store import PatientStore
+        store = PatientStore(source)
+        return {p: [int(n)] for p, n in zip(store.patients, np.diff(store.offsets))}
+    out = {}
+    for file in sorted(os.listdir(source)):
+        if file.endswith('.csv'):
+            st = os.stat(os.path.join(source, file))
+            out[os.path.splitext(file)[0]] = [st.st_size, st.st_mtime_ns]
+    return out
+
+
+def load_patients(source, selected_columns, patients):
+    # Filled, unscaled float32 rows of the given patient ids only, NaN rows dropped
+    if is_store(source):
+        from utils.store import PatientStore
+        store = PatientStore(source)
+        index = {p: i for i, p in enumerate(store.patients)}
+        chosen = sorted(index[p] for p in patients)
+        lengths = np.diff(store.offsets)[chosen]
+        rows = np.concatenate([np.arange(store.offsets[i], store.offsets[i + 1]) for i in chosen] or [[]]).astype(np.int64)
+        X = np.asarray(store.values[np.ix_(rows, [store.columns.index(c) for c in selected_columns])], dtype=np.float32)
+        local = np.concatenate([[0], np.cumsum(lengths)])
+        X = segment_bfill(segment_ffill(X, local), local)
+    else:
+        blocks = [read_table(os.path.join(source, p + '.csv'), selected_columns)[selected_columns]
+                  .ffill().bfill().to_numpy(dtype=np.float32) for p in patients]
+        X = np.vstack(blocks) if blocks else np.empty((0, len(selected_columns)), dtype=np.float32)
+    return X[~np.isnan(X).any(axis=1)]
@@ -0,0 +1,152 @@
+import time
+import numpy as np
+from utils.instrumentation import observe
+
+# Declarative clinical rule sets compiled into vectorized NumPy mask operations.
+# A rule set is plain data: criteria of (column, comparator, threshold, weight) and the
+# minimum weighted score that counts as detected. Comparators:
+#   '>', '>=', '<', '<=', '=='    threshold is a number
+#   'outside'                      threshold is (lo, hi): value < lo or value > hi
+#   'between'                      threshold is (lo, hi): lo <= value <= hi
+# NaN never satisfies a criterion. With missing='ignore' a missing value simply adds 0
+# (the behaviour of the original app); with missing='propagate' the score is NaN for any
+# row where a criterion could not be evaluated. The number of unevaluable criteria per
+# row is always reported.
+
+BUILTIN_RULE_SETS = {
+    # Inline heuristic from app.py: one point per abnormal vital, detected at >= 2
+    'physionet_score': {
+        'min_score': 2,
+        'criteria': [
+            ('HR', '>', 100, 1),
+            ('O2Sat', '<', 92, 1),
+            ('Resp', '>', 22, 1),
+            ('Temp', 'outside', (36, 38), 1),
+            ('MAP', '<', 70, 1),
+            ('WBC', 'outside', (4, 12), 1),
+            ('Platelets', '<', 150, 1),
+        ],
+    },
+    # physionet_rules(): any single abnormal vital
+    'physionet_any': {
+        'min_score': 1,
+        'criteria': [
+            ('HR', '>', 100, 1),
+            ('O2Sat', '<', 92, 1),
+            ('Resp', '>', 22, 1),
+            ('Temp', 'outside', (36, 38), 1),
+            ('MAP', '<', 70, 1),
+            ('WBC', 'outside', (4, 12), 1),
+            ('Platelets', '<', 150, 1),
+        ],
+    },
+    # qSOFA without mental status
+    'qsofa': {
+        'min_score': 2,
+        'criteria': [
+            ('Resp', '>=', 22, 1),
+            ('MAP', '<=', 65, 1),
+        ],
+    },
+    # qSOFA >= 2 OR any Sepsis-3 style flag: flags weigh 2 so either path reaches 2
+    'qsofa_sepsis3': {
+        'min_score': 2,
+        'criteria': [
+            ('Resp', '>=', 22, 1),
+            ('MAP', '<=', 65, 1),
+            ('HR', '>', 100, 2),
+            ('O2Sat', '<', 92, 2),
+            ('Temp', 'outside', (36, 38), 2),
+            ('WBC', 'outside', (4, 12), 2),
+            ('Platelets', '<', 150, 2),
+        ],
+    },
+    'sirs': {
+        'min_score': 2,
+        'criteria': [
+            ('Temp', 'outside', (36, 38), 1),
+            ('HR', '>', 90, 1),
+            ('Resp', '>', 20, 1),
+            ('WBC', 'outside', (4, 12), 1),
+        ],
+    },
+}
+
+_SIMPLE = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal, '==': np.equal}
+
+
+class RuleSet:
+    def __init__(self, name, criteria, min_score, missing='ignore'):
+        if missing not in ('ignore', 'propagate'):
+            raise ValueError(f"missing must be 'ignore' or 'propagate', got {missing!r}")
+        self.name = name
+        self.criteria = [tuple(c) for c in criteria]
+        self.min_score = min_score
+        self.missing = missing
+        self.columns = list(dict.fromkeys(c[0] for c in self.criteria))
+        for column, op, threshold, _ in self.criteria:
+            if op not in _SIMPLE and op not in ('outside', 'between'):
+                raise ValueError(f"{name}: unknown comparator {op!r} for {column}")
+
+        # Group criteria by comparator so each group is one broadcast comparison
+        col_index = {c: i for i, c in enumerate(self.columns)}
+        self._groups = []
+        for op in list(_SIMPLE) + ['outside', 'between']:
+            group = [c for c in self.criteria if c[1] == op]
+            if not group:
+                continue
+            idx = np.array([col_index[c[0]] for c in group])
+            weights = np.array([c[3] for c in group], dtype=np.float32)
+            if op in _SIMPLE:
+                thr = np.array([c[2] for c in group], dtype=np.float64)
+                self._groups.append((op, idx, thr, None, weights))
+            else:
+                lo = np.array([c[2][0] for c in group], dtype=np.float64)
+                hi = np.array([c[2][1] for c in group], dtype=np.float64)
+                self._groups.append((op, idx, lo, hi, weights))
+
+    @classmethod
+    def builtin(cls, name, missing='ignore'):
+        spec = BUILTIN_RULE_SETS[name]
+        return cls(name, spec['criteria'], spec['min_score'], missing)
+
+    def _matrix(self, data, columns=None):
+        # Accepts an (n, k) array in `columns` order (default: this rule set's columns),
+        # a DataFrame or a dict of column arrays
+        if hasattr(data, 'columns') or isinstance(data, dict):
+            return np.column_stack([np.asarray(data[c], dtype=np.float64) for c in self.columns])
+        X = np.asarray(data, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if columns is not None and list(columns) != self.columns:
+            X = X[:, [list(columns).index(c) for c in self.columns]]
+        return X
+
+    def evaluate(self, data, columns=None):
+        start = time.perf_counter()
+        X = self._matrix(data, columns)
+        score = np.zeros(len(X), dtype=np.float32)
+        n_missing = np.zeros(len(X), dtype=np.int16)
+        with np.errstate(invalid='ignore'):
+            for op, idx, a, b, weights in self._groups:
+                values = X[:, idx]
+                if op in _SIMPLE:
+                    hit = _SIMPLE[op](values, a)
+                elif op == 'outside':
+                    hit = (values < a) | (values > b)
+                else:
+                    hit = (values >= a) & (values <= b)
+                score += hit.astype(np.float32) @ weights
+                n_missing += np.isnan(values).sum(axis=1, dtype=np.int16)
+
+        if self.missing == 'propagate':
+            score[n_missing > 0] = np.nan
+        detected = score >= self.min_score  # NaN -> False
+        observe('rule_eval_seconds', time.perf_counter() - start, rule_set=self.name)
+        return {'score': score, 'detected': detected, 'n_missing': n_missing}
+
+
+def evaluate_all(data, names=None, columns=None, missing='ignore'):
+    # Several built-in rule sets over the same rows
+    return {name: RuleSet.builtin(name, missing).evaluate(data, columns)
+            for name in (names or BUILTIN_RULE_SETS)}
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from utils.instrumentation import count
+
+# PhysioNet 2019 patient file schema: column -> (dtype, unit, valid min, valid max).
+# Readers parse only the columns they need, straight into these dtypes, and values
+# outside the valid range are rejected: measurements become NaN (missing, so the
+# usual forward/back fill applies) and are counted per column in values_rejected_total;
+# an out-of-range flag or label means a corrupt file and raises.
+# Unit1/Unit2 are flags but missing for part of the cohort, so they stay float32.
+SCHEMA = {
+    'HR': ('float32', 'beats/min', 0, 300),
+    'O2Sat': ('float32', '%', 0, 100),
+    'Temp': ('float32', 'deg C', 25, 45),
+    'SBP': ('float32', 'mm Hg', 0, 300),
+    'MAP': ('float32', 'mm Hg', 0, 300),
+    'DBP': ('float32', 'mm Hg', 0, 300),
+    'Resp': ('float32', 'breaths/min', 0, 100),
+    'EtCO2': ('float32', 'mm Hg', 0, 100),
+    'BaseExcess': ('float32', 'mmol/L', -50, 50),
+    'HCO3': ('float32', 'mmol/L', 0, 60),
+    'FiO2': ('float32', 'fraction', 0, 1),
+    'pH': ('float32', '', 6.5, 8.0),
+    'PaCO2': ('float32', 'mm Hg', 0, 150),
+    'SaO2': ('float32', '%', 0, 100),
+    'AST': ('float32', 'IU/L', 0, 20000),
+    'BUN': ('float32', 'mg/dL', 0, 300),
+    'Alkalinephos': ('float32', 'IU/L', 0, 5000),
+    'Calcium': ('float32', 'mg/dL', 0, 30),
+    'Chloride': ('float32', 'mmol/L', 0, 200),
+    'Creatinine': ('float32', 'mg/dL', 0, 50),
+    'Bilirubin_direct': ('float32', 'mg/dL', 0, 50),
+    'Glucose': ('float32', 'mg/dL', 0, 2000),
+    'Lactate': ('float32', 'mg/dL', 0, 40),
+    'Magnesium': ('float32', 'mmol/dL', 0, 10),
+    'Phosphate': ('float32', 'mg/dL', 0, 20),
+    'Potassium': ('float32', 'mmol/L', 0, 30),
+    'Bilirubin_total': ('float32', 'mg/dL', 0, 60),
+    'TroponinI': ('float32', 'ng/mL', 0, 500),
+    'Hct': ('float32', '%', 0, 100),
+    'Hgb': ('float32', 'g/dL', 0, 35),
+    'PTT': ('float32', 's', 0, 300),
+    'WBC': ('float32', '10^3/uL', 0, 500),
+    'Fibrinogen': ('float32', 'mg/dL', 0, 2000),
+    'Platelets': ('float32', '10^3/uL', 0, 3000),
+    'Age': ('float32', 'years', 0, 120),
+    'Gender': ('int8', '0 female / 1 male', 0, 1),
+    'Unit1': ('float32', '0/1 MICU', 0, 1),
+    'Unit2': ('float32', '0/1 SICU', 0, 1),
+    'HospAdmTime': ('float32', 'hours', -20000, 100),
+    'ICULOS': ('int16', 'hours', 1, 20000),
+    'SepsisLabel': ('int8', '0/1', 0, 1),
+}
+COLUMNS = list(SCHEMA)
+DTYPES = {c: spec[0] for c, spec in SCHEMA.items()}
+LOW = {c: np.float32(spec[2]) for c, spec in SCHEMA.items()}
+HIGH = {c: np.float32(spec[3]) for c, spec in SCHEMA.items()}
+LABEL_COLUMN = 'SepsisLabel'
+
+
+def enforce_schema(df, source=''):
+    # Cast every known column to its schema dtype and reject out-of-range values, one
+    # vectorized comparison per column (NaN compares False, so missing stays missing).
+    # Building the typed frame from arrays is much cheaper than read_csv's dtype= path.
+    arrays = {}
+    for col in df.columns:
+        x = df[col].to_numpy()
+        if col in SCHEMA:
+            bad = (x < LOW[col]) | (x > HIGH[col])
+            if DTYPES[col] == 'float32':
+                x = x.astype(np.float32)
+                n = int(bad.sum())
+                if n:
+                    x[bad] = np.nan
+                    count('values_rejected_total', n, column=col)
+            else:
+                if bad.any() or (x.dtype.kind == 'f' and np.isnan(x).any()):
+                    raise ValueError(f"{source or 'input'}: {col} missing or outside [{SCHEMA[col][2]}, {SCHEMA[col][3]}]")
+                x = x.astype(DTYPES[col])
+        arrays[col] = x
+    return pd.DataFrame(arrays, copy=False)
+
+
+def read_table(path, columns=None, sep=None):
+    # Typed read of a .psv/.csv patient file (or buffer) parsing only the given columns;
+    # columns=None reads them all. Requested columns missing from the file are simply
+    # absent from the frame (ICULOS and SepsisLabel are optional).
+    if sep is None:
+        sep = '|' if str(path).endswith('.psv') else ','
+    usecols = None
+    if columns is not None:
+        wanted = set(columns)
+        usecols = lambda c: c in wanted
+    df = pd.read_csv(path, sep=sep, usecols=usecols)
+    return enforce_schema(df, path if isinstance(path, str) else '')
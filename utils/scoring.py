@@ -0,0 +1,129 @@
+import os
+import numpy as np
+import torch
+from model.bundle import load_bundle
+from utils.rules import RuleSet
+from utils.instrumentation import count, timer
+
+# Vitals used by the VAE and the PhysioNet heuristic (same order as app.py)
+columns = ['HR', 'O2Sat', 'Resp', 'Temp', 'MAP', 'WBC', 'Platelets']
+PHYSIO_RULES = RuleSet.builtin('physionet_score')
+
+
+# -----------------------------
+# Artifacts
+# -----------------------------
+def load_artifacts(model_dir='saved_models', precision='fp32'):
+    bundle = load_bundle(os.path.join(model_dir, "vae_bundle.pt"), precision)
+    bundle.check_columns(columns)
+    return bundle.model, bundle.scaler, bundle.threshold
+
+
+# -----------------------------
+# Vectorized scoring
+# -----------------------------
+def physio_scores(X):
+    # Same heuristic as the Streamlit form (rule set 'physionet_score' in utils/rules.py),
+    # evaluated over whole columns. Missing vitals never add to the score.
+    return PHYSIO_RULES.evaluate(X, columns)['score'].astype(np.int8)
+
+
+def recon_errors(model, scaler, X, batch_size=65536, mc_samples=0):
+    # Rows with any missing vital cannot be reconstructed -> NaN error.
+    # mc_samples > 0 switches to Monte Carlo decoding and also returns the variance.
+    valid = ~np.isnan(X).any(axis=1)
+    errors = np.full(len(X), np.nan, dtype=np.float32)
+    variance = np.full(len(X), np.nan, dtype=np.float32) if mc_samples else None
+    if not valid.any():
+        return errors, variance
+
+    with timer('scaler_transform_seconds'):
+        X_scaled = scaler.transform(X[valid]).astype(np.float32)
+    out = np.empty(len(X_scaled), dtype=np.float32)
+    out_var = np.empty(len(X_scaled), dtype=np.float32)
+    for start in range(0, len(X_scaled), batch_size):
+        batch = torch.from_numpy(X_scaled[start:start + batch_size])
+        with timer('forward_seconds'):
+            if mc_samples:
+                mean, var = model.mc_recon_error(batch, mc_samples)
+                out[start:start + batch_size] = mean.numpy()
+                out_var[start:start + batch_size] = var.numpy()
+            else:
+                out[start:start + batch_size] = model.recon_error(batch).numpy()
+    count('rows_scored_total', len(X))
+    errors[valid] = out
+    if mc_samples:
+        variance[valid] = out_var
+    return errors, variance
+
+
+def embed_rows(model, scaler, X, batch_size=65536):
+    # Latent mean (mu) per row; rows with any missing vital -> NaN
+    valid = ~np.isnan(X).any(axis=1)
+    X_scaled = scaler.transform(X[valid]).astype(np.float32) if valid.any() else np.empty((0, X.shape[1]), np.float32)
+    with timer('embed_seconds'):
+        # At least one (possibly empty) batch, so the latent width is known
+        Z = np.vstack([model.embed(torch.from_numpy(X_scaled[start:start + batch_size])).numpy()
+                       for start in range(0, max(len(X_scaled), 1), batch_size)])
+    out = np.full((len(X), Z.shape[1]), np.nan, dtype=np.float32)
+    out[valid] = Z
+    return out
+
+
+def score_rows(model, scaler, threshold, X, batch_size=65536, mc_samples=0):
+    errors, variance = recon_errors(model, scaler, X, batch_size, mc_samples)
+    physio = physio_scores(X)
+    scores = {
+        'recon_error': errors,
+        'vae_flag': errors > threshold,   # NaN -> False
+        'physio_score': physio,
+        'physio_flag': physio >= PHYSIO_RULES.min_score,
+    }
+    if variance is not None:
+        scores['recon_error_var'] = variance
+    return scores
+
+
+# -----------------------------
+# Streaming row source
+# -----------------------------
+def prepare_patient(df):
+    # One patient's frame -> (filled vitals, ICU hours, SepsisLabel or -1)
+    # Forward/back fill within the patient, as preprocess_all_csvs does
+    with timer('preprocess_seconds'):
+        vitals = df[columns].ffill().bfill()
+    hours = df['ICULOS'].to_numpy() if 'ICULOS' in df else np.arange(1, len(df) + 1)
+    labels = df['SepsisLabel'].to_numpy() if 'SepsisLabel' in df else np.full(len(df), -1)
+    return vitals.to_numpy(dtype=np.float64), hours, labels
+
+
+def _read_patient(path):
+    from utils.schema import read_table   # pandas: only file readers pay for it, not serving
+    with timer('file_parse_seconds'):
+        df = read_table(path, columns + ['ICULOS', 'SepsisLabel'])
+    count('files_parsed_total')
+    return prepare_patient(df)
+
+
+def iter_chunks(folder_path, chunk_rows=200000, patients=None):
+    # Yields (patient_ids, hours, labels, X) blocks of roughly chunk_rows rows; patients
+    # (file names without extension) restricts it to those files. A patient is never split.
+    files = sorted(f for f in os.listdir(folder_path) if f.endswith(('.csv', '.psv')))
+    if patients is not None:
+        wanted = set(patients)
+        files = [f for f in files if os.path.splitext(f)[0] in wanted]
+    ids, hours, labels, blocks = [], [], [], []
+    n = 0
+    for file in files:
+        X, h, y = _read_patient(os.path.join(folder_path, file))
+        ids.append(np.full(len(X), os.path.splitext(file)[0]))
+        hours.append(h)
+        labels.append(y)
+        blocks.append(X)
+        n += len(X)
+        if n >= chunk_rows:
+            yield np.concatenate(ids), np.concatenate(hours), np.concatenate(labels), np.vstack(blocks)
+            ids, hours, labels, blocks = [], [], [], []
+            n = 0
+    if blocks:
+        yield np.concatenate(ids), np.concatenate(hours), np.concatenate(labels), np.vstack(blocks)
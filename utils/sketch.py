@@ -0,0 +1,85 @@
+import math
+import numpy as np
+
+# Mergeable streaming quantile sketch (DDSketch-style log buckets).
+# Positive values land in bucket ceil(log_gamma(x)), so any quantile is returned within
+# `relative_accuracy` of the true value. Memory grows with log(max/min), not with the
+# number of values, and two sketches merge exactly by adding bucket counts, so workers
+# can sketch disjoint shards and the parent combines them.
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=0.005, min_value=1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.offset = 0                      # bucket index of counts[0]
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0                  # values <= min_value
+        self.count = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        small = values <= self.min_value
+        self.zero_count += int(small.sum())
+        self.count += len(values)
+        values = values[~small]
+        if len(values):
+            idx = np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+            self._add_buckets(int(idx.min()), np.bincount(idx - idx.min()))
+        return self
+
+    def _add_buckets(self, offset, counts):
+        if not len(self.counts):
+            self.offset, self.counts = offset, counts.astype(np.int64)
+            return
+        lo = min(self.offset, offset)
+        hi = max(self.offset + len(self.counts), offset + len(counts))
+        merged = np.zeros(hi - lo, dtype=np.int64)
+        merged[self.offset - lo:self.offset - lo + len(self.counts)] += self.counts
+        merged[offset - lo:offset - lo + len(counts)] += counts
+        self.offset, self.counts = lo, merged
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(other.counts):
+            self._add_buckets(other.offset, other.counts)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        i = min(i, len(self.counts) - 1)
+        # Bucket midpoint in relative terms
+        return 2 * self.gamma ** (self.offset + i) / (self.gamma + 1)
+
+    # -----------------------------
+    # Serialization (for worker results and saved artifacts)
+    # -----------------------------
+    def to_dict(self):
+        nonzero = np.flatnonzero(self.counts)
+        return {'relative_accuracy': self.relative_accuracy, 'min_value': self.min_value,
+                'zero_count': self.zero_count, 'count': self.count,
+                'buckets': {str(self.offset + int(i)): int(self.counts[i]) for i in nonzero}}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['relative_accuracy'], d['min_value'])
+        sketch.zero_count, sketch.count = d['zero_count'], d['count']
+        if d['buckets']:
+            idx = np.array([int(k) for k in d['buckets']])
+            counts = np.zeros(idx.max() - idx.min() + 1, dtype=np.int64)
+            counts[idx - idx.min()] = list(d['buckets'].values())
+            sketch.offset, sketch.counts = int(idx.min()), counts
+        return sketch
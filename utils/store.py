@@ -0,0 +1,115 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils.schema import read_table
+
+# Consolidated columnar patient store: one directory holding
+#   values.npy   float32 (n_rows, n_cols), column-major so each column is contiguous
+#   offsets.npy  int64 (n_patients + 1), rows of patient i are offsets[i]:offsets[i+1]
+#   labels.npy   int8 SepsisLabel per row
+#   meta.json    column names and patient ids
+# Everything is memory-mapped on open, so reading a column touches only its pages.
+STORE_PATH = 'data/patient_store'
+STORE_FORMAT = 1
+LABEL_COLUMN = 'SepsisLabel'
+
+
+class PatientStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != STORE_FORMAT:
+            raise ValueError(f"{path}: unsupported store format {meta.get('format')}")
+        self.columns = meta['columns']
+        self.patients = meta['patients']
+        self._index = {c: i for i, c in enumerate(self.columns)}
+
+        self.values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        self.labels = np.load(os.path.join(path, 'labels.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def column(self, name):
+        # Zero-copy view onto the memory-mapped column
+        return self.values[:, self._index[name]]
+
+    def matrix(self, columns):
+        # Gathers only the requested columns into an (n_rows, k) float32 array
+        out = np.empty((len(self), len(columns)), dtype=np.float32)
+        for j, name in enumerate(columns):
+            out[:, j] = self.column(name)
+        return out
+
+    def patient_ids(self):
+        # Patient index of every row
+        return np.repeat(np.arange(len(self.patients)), np.diff(self.offsets))
+
+
+def iter_patient_ranges(offsets, chunk_rows):
+    # (first, last) patient ranges of roughly chunk_rows rows; never splits a patient
+    first = 0
+    while first < len(offsets) - 1:
+        last = int(np.searchsorted(offsets, offsets[first] + chunk_rows, side='right')) - 1
+        last = min(max(last, first + 1), len(offsets) - 1)
+        yield first, last
+        first = last
+
+
+def read_patient_file(path):
+    df = read_table(path)
+    labels = df.pop(LABEL_COLUMN).to_numpy(dtype=np.int8) if LABEL_COLUMN in df else np.zeros(len(df), dtype=np.int8)
+    return list(df.columns), df.to_numpy(dtype=np.float32), labels
+
+
+def create_values(path, n_rows, n_cols):
+    # Writable memmap for filling a store chunk by chunk; finish with finalize_store
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    return np.lib.format.open_memmap(os.path.join(path, 'values.npy'), mode='w+', dtype=np.float32,
+                                     shape=(n_rows, n_cols), fortran_order=True)
+
+
+def finalize_store(path, patients, columns, offsets, labels):
+    np.save(os.path.join(path, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(path, 'labels.npy'), np.asarray(labels, dtype=np.int8))
+    # meta.json goes last: its presence marks a complete store
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'format': STORE_FORMAT, 'columns': list(columns), 'patients': list(patients)}, f)
+
+
+def write_store(path, patients, columns, blocks, labels):
+    # blocks/labels: per-patient arrays in the same order as patients
+    lengths = np.array([len(b) for b in blocks], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    values = create_values(path, int(offsets[-1]), len(columns))
+    for start, block in zip(offsets[:-1], blocks):
+        values[start:start + len(block)] = block
+    values.flush()
+    del values
+
+    finalize_store(path, patients, columns, offsets,
+                   np.concatenate(labels) if labels else np.zeros(0, dtype=np.int8))
+
+
+def build_store(folder_path, path=STORE_PATH, workers=None):
+    files = sorted(f for f in os.listdir(folder_path) if f.endswith(('.psv', '.csv')))
+    paths = [os.path.join(folder_path, f) for f in files]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(read_patient_file, paths, chunksize=max(1, len(paths) // (4 * (workers or os.cpu_count())))))
+
+    columns = results[0][0] if results else []
+    for file, (cols, _, _) in zip(files, results):
+        if cols != columns:
+            raise ValueError(f"{file}: columns differ from {files[0]}")
+
+    write_store(path, [os.path.splitext(f)[0] for f in files], columns,
+                [r[1] for r in results], [r[2] for r in results])
+    return sum(len(r[1]) for r in results)
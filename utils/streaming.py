@@ -0,0 +1,140 @@
+import numpy as np
+import torch
+from utils.scoring import columns, physio_scores, PHYSIO_RULES
+
+# Stateful per-patient scorer for vitals arriving one hour at a time per bed.
+# State lives in preallocated arrays indexed by a slot per active patient:
+#   last      last observed value per vital (streaming forward fill)
+#   ring/sums trailing window of filled vitals with running sums -> rolling mean
+#   error/physio/hour  last emitted scores
+# Each event touches a fixed amount of state, so cost is O(1) per event; batches of
+# events from different patients are scored with one vectorized forward pass.
+
+
+class StreamingScorer:
+    def __init__(self, model, scaler, threshold, window=6, capacity=1024):
+        self.model = model
+        self.scaler = scaler
+        self.threshold = threshold
+        self.window = window
+        self.k = len(columns)
+        self.slots = {}
+        self.free = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        def grow(old, shape, fill, dtype=np.float32):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+        k, w = self.k, self.window
+        self.last = grow(getattr(self, 'last', None), (capacity, k), np.nan)
+        self.ring = grow(getattr(self, 'ring', None), (capacity, w, k), np.nan)
+        self.sums = grow(getattr(self, 'sums', None), (capacity, k), 0.0, np.float64)
+        self.counts = grow(getattr(self, 'counts', None), (capacity, k), 0, np.int32)
+        self.n_events = grow(getattr(self, 'n_events', None), (capacity,), 0, np.int64)
+        self.error = grow(getattr(self, 'error', None), (capacity,), np.nan)
+        self.physio = grow(getattr(self, 'physio', None), (capacity,), 0, np.int8)
+        self.hour = grow(getattr(self, 'hour', None), (capacity,), -1, np.int64)
+        self.capacity = capacity
+
+    def _slot(self, pid):
+        slot = self.slots.get(pid)
+        if slot is None:
+            if not self.free:
+                self.free = list(range(self.capacity * 2 - 1, self.capacity - 1, -1))
+                self._allocate(self.capacity * 2)
+            slot = self.free.pop()
+            self.slots[pid] = slot
+        return slot
+
+    def discharge(self, pid):
+        slot = self.slots.pop(pid, None)
+        if slot is None:
+            return
+        self.last[slot] = np.nan
+        self.ring[slot] = np.nan
+        self.sums[slot] = 0.0
+        self.counts[slot] = 0
+        self.n_events[slot] = 0
+        self.error[slot] = np.nan
+        self.physio[slot] = 0
+        self.hour[slot] = -1
+        self.free.append(slot)
+
+    def __len__(self):
+        return len(self.slots)
+
+    # -----------------------------
+    # Events
+    # -----------------------------
+    def observe(self, pid, values, hour=None):
+        # values: one row in `columns` order (NaN = not measured this hour)
+        result = self.observe_batch([pid], np.asarray(values, dtype=np.float32).reshape(1, -1),
+                                    None if hour is None else [hour])
+        return {key: v[0] for key, v in result.items()}
+
+    def observe_batch(self, pids, X, hours=None):
+        X = np.asarray(X, dtype=np.float32)
+        slots = np.fromiter((self._slot(p) for p in pids), dtype=np.int64, count=len(pids))
+        hours = np.asarray(hours, dtype=np.int64) if hours is not None else None
+
+        # A patient can appear more than once in a batch: apply those events in rounds
+        _, first = np.unique(slots, return_index=True)
+        if len(first) == len(slots):
+            return self._apply(slots, X, hours)
+
+        rank = np.zeros(len(slots), dtype=np.int64)
+        seen = {}
+        for i, s in enumerate(slots):
+            rank[i] = seen.get(s, 0)
+            seen[s] = rank[i] + 1
+        out = None
+        for r in range(rank.max() + 1):
+            idx = np.flatnonzero(rank == r)
+            part = self._apply(slots[idx], X[idx], None if hours is None else hours[idx])
+            if out is None:
+                out = {key: np.empty(len(slots), dtype=v.dtype) if v.ndim == 1
+                       else np.empty((len(slots),) + v.shape[1:], dtype=v.dtype) for key, v in part.items()}
+            for key, v in part.items():
+                out[key][idx] = v
+        return out
+
+    def _apply(self, slots, X, hours):
+        # Forward fill from the last observed values
+        observed = ~np.isnan(X)
+        filled = np.where(observed, X, self.last[slots])
+        self.last[slots] = filled
+
+        # Rolling window: replace the oldest row and update running sums
+        pos = self.n_events[slots] % self.window
+        old = self.ring[slots, pos]
+        old_valid = ~np.isnan(old)
+        new_valid = ~np.isnan(filled)
+        self.sums[slots] += np.where(new_valid, filled, 0.0) - np.where(old_valid, old, 0.0)
+        self.counts[slots] += new_valid.astype(np.int32) - old_valid
+        self.ring[slots, pos] = filled
+        self.n_events[slots] += 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rolling_mean = (self.sums[slots] / self.counts[slots]).astype(np.float32)
+
+        # Scores
+        error = np.full(len(slots), np.nan, dtype=np.float32)
+        valid = new_valid.all(axis=1)
+        if valid.any():
+            x = torch.from_numpy(self.scaler.transform(filled[valid]).astype(np.float32))
+            error[valid] = self.model.recon_error(x).numpy()
+        physio = physio_scores(filled)
+
+        self.error[slots] = error
+        self.physio[slots] = physio
+        if hours is not None:
+            self.hour[slots] = hours
+        return {
+            'recon_error': error,
+            'vae_flag': error > self.threshold,
+            'physio_score': physio,
+            'physio_flag': physio >= PHYSIO_RULES.min_score,
+            'rolling_mean': rolling_mean,
+        }
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.schema import HIGH, LOW
+
+# Synthetic PhysioNet 2019 cohort with the 41-column PSV schema.
+# Per column: (mean, std, min, max, fraction of hours with a measurement), roughly
+# matching the published training set so sparsity and value ranges look realistic.
+# Values are also clipped to utils.schema's valid range, so readers never reject them.
+DISTRIBUTIONS = {
+    'HR': (84.6, 17.3, 20, 280, 0.90),
+    'O2Sat': (97.2, 2.9, 20, 100, 0.87),
+    'Temp': (36.98, 0.77, 20.9, 50, 0.34),
+    'SBP': (123.8, 23.2, 20, 300, 0.85),
+    'MAP': (82.4, 16.3, 20, 300, 0.88),
+    'DBP': (63.8, 13.9, 20, 300, 0.69),
+    'Resp': (18.7, 5.1, 1, 100, 0.85),
+    'EtCO2': (33.0, 7.9, 10, 100, 0.04),
+    'BaseExcess': (-0.7, 4.3, -32, 100, 0.05),
+    'HCO3': (24.1, 4.4, 0, 55, 0.04),
+    'FiO2': (0.55, 0.11, 0, 1, 0.08),
+    'pH': (7.38, 0.07, 6.62, 7.93, 0.07),
+    'PaCO2': (41.0, 9.3, 10, 100, 0.06),
+    'SaO2': (92.7, 10.9, 23, 100, 0.03),
+    'AST': (260.0, 855.0, 3, 9961, 0.02),
+    'BUN': (23.9, 19.9, 1, 268, 0.07),
+    'Alkalinephos': (102.5, 120.1, 7, 3833, 0.02),
+    'Calcium': (7.6, 2.4, 1, 27.9, 0.06),
+    'Chloride': (105.8, 5.9, 26, 145, 0.05),
+    'Creatinine': (1.51, 1.81, 0.1, 46.6, 0.06),
+    'Bilirubin_direct': (1.8, 3.8, 0.01, 37.5, 0.002),
+    'Glucose': (136.9, 51.3, 10, 988, 0.17),
+    'Lactate': (2.6, 2.1, 0.2, 31, 0.03),
+    'Magnesium': (2.05, 0.4, 0.2, 9.8, 0.06),
+    'Phosphate': (3.5, 1.4, 0.2, 18.8, 0.04),
+    'Potassium': (4.14, 0.64, 1, 27.5, 0.09),
+    'Bilirubin_total': (2.1, 4.3, 0.1, 49.6, 0.01),
+    'TroponinI': (8.3, 24.8, 0.01, 440, 0.01),
+    'Hct': (30.8, 5.5, 5.5, 71.7, 0.09),
+    'Hgb': (10.4, 2.0, 2.2, 32, 0.07),
+    'PTT': (41.2, 26.2, 12.5, 250, 0.03),
+    'WBC': (11.4, 7.7, 0.1, 440, 0.06),
+    'Fibrinogen': (287.4, 153.0, 34, 1760, 0.007),
+    'Platelets': (196.0, 103.0, 1, 2322, 0.06),
+}
+COLUMNS = list(DISTRIBUTIONS) + ['Age', 'Gender', 'Unit1', 'Unit2', 'HospAdmTime', 'ICULOS', 'SepsisLabel']
+
+SEPSIS_RATE = 0.073      # fraction of septic stays
+LABEL_LEAD_HOURS = 6     # PhysioNet labels hours from t_sepsis - 6 onwards
+MEAN_STAY_HOURS = 38.5
+
+
+def generate_cohort(n_patients, seed=0):
+    # Returns (frame with COLUMNS, offsets) for n_patients stays, fully vectorized
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.lognormal(np.log(MEAN_STAY_HOURS) - 0.3, 0.75, n_patients), 8, 336).astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    n = int(offsets[-1])
+    pid = np.repeat(np.arange(n_patients), lengths)
+    hour = np.arange(n) - offsets[pid]
+
+    # Septic stays: onset somewhere in the stay, labels from onset - 6h
+    septic = rng.random(n_patients) < SEPSIS_RATE
+    onset = (rng.uniform(0.3, 1.0, n_patients) * lengths).astype(np.int64)
+    label = septic[pid] & (hour >= onset[pid] - LABEL_LEAD_HOURS)
+    # Ramp from 0 to 1 over the 12 hours before onset, used to drift septic vitals
+    drift = np.where(septic[pid], np.clip((hour - onset[pid] + 12) / 12, 0, 1), 0.0)
+
+    data = {}
+    for col, (mean, std, lo, hi, p_obs) in DISTRIBUTIONS.items():
+        baseline = mean + 0.7 * std * rng.standard_normal(n_patients)
+        values = baseline[pid] + 0.4 * std * rng.standard_normal(n)
+        if col in ('HR', 'Resp', 'Temp', 'WBC', 'Lactate'):
+            values += drift * std
+        elif col in ('MAP', 'SBP', 'Platelets'):
+            values -= drift * std
+        values = np.round(np.clip(values, max(lo, LOW[col]), min(hi, HIGH[col])), 2)
+        values[rng.random(n) >= p_obs] = np.nan
+        data[col] = values
+
+    unit1 = rng.random(n_patients) < 0.5
+    unit_known = rng.random(n_patients) < 0.6
+    data['Age'] = np.round(np.clip(rng.normal(62, 16, n_patients), 18, 100), 2)[pid]
+    data['Gender'] = (rng.random(n_patients) < 0.56).astype(np.int64)[pid]
+    data['Unit1'] = np.where(unit_known, unit1, np.nan)[pid]
+    data['Unit2'] = np.where(unit_known, ~unit1, np.nan)[pid]
+    data['HospAdmTime'] = np.round(np.maximum(-np.abs(rng.exponential(60, n_patients)), LOW['HospAdmTime']), 2)[pid]
+    data['ICULOS'] = hour + 1
+    data['SepsisLabel'] = label.astype(np.int64)
+    return pd.DataFrame(data, columns=COLUMNS), offsets
+
+
+def write_psv_cohort(folder_path, n_patients, seed=0, chunk_patients=2000):
+    # One p<id>.psv per stay, formatted in bulk and split per patient
+    os.makedirs(folder_path, exist_ok=True)
+    rows = 0
+    for first in range(0, n_patients, chunk_patients):
+        count = min(chunk_patients, n_patients - first)
+        df, offsets = generate_cohort(count, seed=seed + first)
+        lines = df.to_csv(sep='|', index=False, header=False, na_rep='NaN',
+                          float_format='%.10g', lineterminator='\n').splitlines(keepends=True)
+        header = '|'.join(COLUMNS) + '\n'
+        for i in range(count):
+            with open(os.path.join(folder_path, f"p{first + i + 1:06d}.psv"), 'w') as f:
+                f.write(header)
+                f.writelines(lines[offsets[i]:offsets[i + 1]])
+        rows += len(df)
+    return rows